@@ -0,0 +1,71 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    name: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+
+
+# Every index the services rely on. List pages sort on (created_at, _id)
+# descending, so the paged indexes carry both keys after the equality field.
+INDEXES = [
+    IndexSpec("user", "email_unique", (("email", ASCENDING),), unique=True),
+    IndexSpec("user", "role_username", (("role", ASCENDING), ("username", ASCENDING))),
+    IndexSpec("user", "role_created_at", (("role", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING))),
+    IndexSpec("prescriptions", "doctor_id_created_at", (("doctor_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING))),
+    IndexSpec("medicine", "nurse_id_created_at", (("nurse_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING))),
+    IndexSpec("medicine", "nurse_id_name_expiry", (("nurse_id", ASCENDING), ("medicine_name", ASCENDING), ("expiry", ASCENDING)), unique=True),
+]
+
+
+def _matches(spec: IndexSpec, info: dict) -> bool:
+    keys = tuple((field, int(direction)) for field, direction in info["key"])
+    return keys == spec.keys and bool(info.get("unique", False)) == spec.unique
+
+
+async def ensure_indexes(db) -> dict:
+    report = {"created": [], "conflicting": [], "unexpected": []}
+
+    by_collection = defaultdict(list)
+    for spec in INDEXES:
+        by_collection[spec.collection].append(spec)
+
+    for collection_name, specs in by_collection.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+
+        for spec in specs:
+            current = existing.get(spec.name)
+            if current is not None:
+                if not _matches(spec, current):
+                    report["conflicting"].append(f"{collection_name}.{spec.name}")
+                continue
+
+            try:
+                await collection.create_index(list(spec.keys), name=spec.name, unique=spec.unique)
+                report["created"].append(f"{collection_name}.{spec.name}")
+            except OperationFailure as e:
+                logger.error(f"ensure_indexes: could not build {collection_name}.{spec.name}: {e}")
+                report["conflicting"].append(f"{collection_name}.{spec.name}")
+
+        declared = {spec.name for spec in specs} | {"_id_"}
+        report["unexpected"].extend(f"{collection_name}.{name}" for name in existing if name not in declared)
+
+    if report["created"]:
+        logger.info(f"ensure_indexes: created {report['created']}")
+    if report["conflicting"] or report["unexpected"]:
+        logger.warning(f"ensure_indexes: index drift - conflicting: {report['conflicting']}, unexpected: {report['unexpected']}")
+
+    return report
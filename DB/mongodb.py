@@ -1,26 +1,71 @@
-import os
+import asyncio
+import logging
+from typing import Optional
 
-from dotenv import load_dotenv
 from pymongo import AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 from pymongo.server_api import ServerApi
 
-load_dotenv()
+from instrumentation import command_metrics, pool_metrics
+from settings import Settings
 
-MONGO_URI = os.getenv("URI")
 
-if not MONGO_URI:
-    raise RuntimeError("MongoDB URI is not configured")
+logger = logging.getLogger(__name__)
 
-client = AsyncMongoClient(
-    MONGO_URI,
-    server_api=ServerApi("1"),
-)
 
-db = client["hospital_db"]
+def create_client(settings: Settings) -> AsyncMongoClient:
+    if not settings.mongo_uri:
+        raise RuntimeError("MongoDB URI is not configured")
 
-user_collection = db["user"]
-prescription_collection = db["prescriptions"]
-medicine_collection = db["medicine"]
+    return AsyncMongoClient(
+        settings.mongo_uri,
+        server_api=ServerApi("1"),
+        maxPoolSize=settings.mongo_max_pool_size,
+        minPoolSize=settings.mongo_min_pool_size,
+        maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+        connectTimeoutMS=settings.mongo_connect_timeout_ms,
+        serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+        socketTimeoutMS=settings.mongo_socket_timeout_ms,
+        waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+        event_listeners=[command_metrics, pool_metrics],
+    )
 
 
+class MongoDatabase:
 
+    # `owns_client` is False for a client handed in by the caller (tests), which
+    # then stays open on close().
+    def __init__(self, client: AsyncMongoClient, name: str, owns_client: bool = True):
+        self.client = client
+        self.owns_client = owns_client
+        self.db: AsyncDatabase = client[name]
+        self.user_collection: AsyncCollection = self.db["user"]
+        self.prescription_collection: AsyncCollection = self.db["prescriptions"]
+        self.medicine_collection: AsyncCollection = self.db["medicine"]
+        self.transactions = False
+
+    # Concurrent pings make the pool open that many connections now instead of on
+    # the first requests.
+    async def warm_up(self, connections: int):
+        await asyncio.gather(*(self.client.admin.command("ping") for _ in range(max(connections, 1))))
+        logger.info(f"MongoDB warm-up: {max(connections, 1)} connections ready")
+
+    # Multi-document transactions need a replica set member or mongos; on a
+    # standalone mongod stock changes fall back to compensating updates.
+    async def detect_transactions(self) -> bool:
+        hello = await self.client.admin.command("hello")
+        self.transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        if not self.transactions:
+            logger.warning("MongoDB is a standalone server: stock changes run without transactions")
+        return self.transactions
+
+    async def close(self):
+        if self.owns_client:
+            await self.client.close()
+
+
+def open_database(settings: Settings, client: Optional[AsyncMongoClient] = None) -> MongoDatabase:
+    if client is not None:
+        return MongoDatabase(client, settings.mongo_db, owns_client=False)
+    return MongoDatabase(create_client(settings), settings.mongo_db)
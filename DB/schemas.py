@@ -93,4 +93,72 @@ class FetchforManager(BaseModel):
     completed: bool 
     medicines: List[ReadMedicine] = Field(default_factory=list)  
     expiry: datetime
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+
+class PrescriptionPage(BaseModel):
+    items: List[ReadPrescription] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class MedicinePage(BaseModel):
+    items: List[ReadMedicine] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class UserPage(BaseModel):
+    items: List[UserOut] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+MAX_PRESCRIPTION_BATCH = 200
+
+class CreatePrescriptionBatch(BaseModel):
+    prescriptions: List[CreatePrescription] = Field(..., min_length=1, max_length=MAX_PRESCRIPTION_BATCH)
+
+
+class PrescriptionBatchItem(BaseModel):
+    index: int
+    status: str
+    prescription_id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class PrescriptionBatchResult(BaseModel):
+    created: int
+    failed: int
+    results: List[PrescriptionBatchItem] = Field(default_factory=list)
+
+
+class MedicineImportError(BaseModel):
+    line: int
+    detail: str
+
+
+class MedicineImportResult(BaseModel):
+    rows: int
+    accepted: int
+    invalid: int
+    inserted: int
+    incremented: int
+    errors: List[MedicineImportError] = Field(default_factory=list)
+    error: Optional[str] = None
+
+
+MAX_STAFF_BATCH = 500
+
+class StaffOnboard(UserCreate):
+    role: Role
+
+
+class StaffOnboardItem(BaseModel):
+    index: int
+    status: str
+    email: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class StaffOnboardResult(BaseModel):
+    created: int
+    failed: int
+    results: List[StaffOnboardItem] = Field(default_factory=list)
@@ -1,12 +1,226 @@
-from typing import Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from bson import ObjectId
-from pymongo.collection import Collection
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import BulkWriteError
+from pymongo.results import DeleteResult
+
+from cache import LRUCache
+from pagination import SEEK_SORT
+
+
+MEDICINE_DETAIL_PROJECTION = {"medicine_name": 1, "expiry": 1, "created_at": 1, "quantity": 1}
+
+UPSERT_RETRIES = 2
+
+
+@dataclass
+class StockChangeResult:
+    applied: List[int] = field(default_factory=list)
+    not_found: List[int] = field(default_factory=list)
+    insufficient: Optional[int] = None
+    rolled_back: List[int] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.insufficient is None and not self.not_found
+
+
+class _StockShortfall(Exception):
+
+    def __init__(self, index: int):
+        super().__init__(index)
+        self.index = index
 
 
 class  MedicineRepository:
 
-    def __init__(self, collection: Collection):
+    # `cache` holds the MEDICINE_DETAIL_PROJECTION fields per _id. Names and expiry
+    # may be served from it; the cached quantity is only a hint, stock checks
+    # always go to the collection. `transactions` is False on a standalone mongod.
+    def __init__(self, collection: AsyncCollection, cache: Optional[LRUCache] = None, transactions: bool = False):
         self.collection = collection
+        self.cache = cache
+        self.transactions = transactions
+
+    def _remember(self, doc: dict):
+        if self.cache is not None:
+            self.cache.set(doc["_id"], {"_id": doc["_id"], **{field: doc.get(field) for field in MEDICINE_DETAIL_PROJECTION}})
+
+    def _forget(self, id: ObjectId):
+        if self.cache is not None:
+            self.cache.pop(id)
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    async def get(self, id: ObjectId) -> Optional[dict]:
+        return await self.collection.find_one({"_id": id})
+
+    async def get_many(self, ids: Iterable[ObjectId], projection: Optional[dict] = None) -> List[dict]:
+        ids = list(ids)
+        return await self.collection.find({"_id": {"$in": ids}}, projection).batch_size(len(ids)).to_list()
+
+    async def get_details(self, ids: Iterable[ObjectId]) -> dict:
+        details = {}
+        missing = []
+        for id in ids:
+            cached = self.cache.get(id) if self.cache is not None else None
+            if cached is None:
+                missing.append(id)
+            else:
+                details[id] = cached
+
+        if missing:
+            for doc in await self.get_many(missing, MEDICINE_DETAIL_PROJECTION):
+                self._remember(doc)
+                details[doc["_id"]] = doc
+
+        return details
+
+    async def get_for_nurse(self, id: ObjectId, nurse_id: ObjectId) -> Optional[dict]:
+        return await self.collection.find_one({"_id": id, "nurse_id": nurse_id})
+
+    # Only pages that carry every cached field are remembered, so a sparse
+    # projection cannot leave partial entries in the cache.
+    async def list_for_nurse(self, nurse_id: ObjectId, seek: dict, limit: int, projection: Optional[dict] = None) -> List[dict]:
+        cursor = self.collection.find({"nurse_id": nurse_id, **seek}, projection).sort(SEEK_SORT).limit(limit).batch_size(limit)
+        docs = await cursor.to_list()
+        if projection is None or all(field in projection for field in MEDICINE_DETAIL_PROJECTION):
+            for doc in docs:
+                self._remember(doc)
+        return docs
+
+    async def create(self, doc: dict) -> ObjectId:
+        result = await self.collection.insert_one(doc)
+        self._remember(doc)
+        return result.inserted_id
+
+    async def update_for_nurse(self, id: ObjectId, nurse_id: ObjectId, changes: dict) -> Optional[dict]:
+        doc = await self.collection.find_one_and_update(
+            {"_id": id, "nurse_id": nurse_id},
+            {"$set": changes},
+            projection=MEDICINE_DETAIL_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc:
+            self._remember(doc)
+        else:
+            self._forget(id)
+        return doc
+
+    async def delete_for_nurse(self, id: ObjectId, nurse_id: ObjectId) -> DeleteResult:
+        result = await self.collection.delete_one({"_id": id, "nurse_id": nurse_id})
+        self._forget(id)
+        return result
+
+
+    # Adds stock per (medicine_name, expiry) lot in one unordered bulk write: an
+    # existing lot of this nurse gets its quantity incremented, a new one is
+    # inserted. Lots are unique per nurse, so when two writers upsert the same new
+    # lot one gets E11000; that op is retried and then matches the other's insert.
+    # Returns (inserted, incremented).
+    async def add_stock(self, nurse_id: ObjectId, lots: Dict[Tuple[str, datetime], int], created_at: datetime) -> Tuple[int, int]:
+        if not lots:
+            return 0, 0
+
+        operations = [
+            UpdateOne(
+                {"nurse_id": nurse_id, "medicine_name": name, "expiry": expiry},
+                {"$inc": {"quantity": quantity}, "$setOnInsert": {"created_at": created_at}},
+                upsert=True
+            )
+            for (name, expiry), quantity in lots.items()
+        ]
+        inserted = incremented = 0
+        try:
+            for attempt in range(UPSERT_RETRIES + 1):
+                try:
+                    result = await self.collection.bulk_write(operations, ordered=False)
+                except BulkWriteError as bwe:
+                    errors = bwe.details.get("writeErrors", [])
+                    if attempt == UPSERT_RETRIES or any(error.get("code") != 11000 for error in errors):
+                        raise
+                    inserted += bwe.details.get("nUpserted", 0)
+                    incremented += bwe.details.get("nMatched", 0)
+                    operations = [operations[error["index"]] for error in errors]
+                    continue
+                inserted += result.upserted_count
+                incremented += result.matched_count
+                break
+        finally:
+            if self.cache is not None:
+                self.cache.pop_where(lambda doc: (doc.get("medicine_name"), doc.get("expiry")) in lots)
+        return inserted, incremented
+
+    # Applies (medicine_id, delta) pairs all-or-nothing, where a negative delta only
+    # matches while `quantity >= -delta`. With transactions this is one bulk write
+    # that is aborted if any op matches nothing, after which one read tells a
+    # missing medicine apart from short stock.
+    async def apply_stock_changes(self, changes: List[Tuple[ObjectId, int]]) -> StockChangeResult:
+        result = StockChangeResult()
+        if not changes:
+            return result
+
+        try:
+            if self.transactions:
+                await self._apply_in_transaction(changes)
+            else:
+                await self._apply_one_by_one(changes)
+        except _StockShortfall as shortfall:
+            stock = {
+                doc["_id"]: doc.get("quantity", 0)
+                for doc in await self.get_many([id for id, _ in changes], {"quantity": 1})
+            }
+            result.not_found = [index for index, (id, _) in enumerate(changes) if id not in stock]
+            if not result.not_found:
+                short = [index for index, (id, delta) in enumerate(changes) if delta < 0 and stock[id] < -delta]
+                # Stock moved again after the abort; report the op that missed.
+                result.insufficient = short[0] if short else shortfall.index
+            failed = set(result.not_found) | {result.insufficient}
+            result.rolled_back = [index for index in range(len(changes)) if index not in failed]
+        else:
+            result.applied = list(range(len(changes)))
+
+        for id, _ in changes:
+            self._forget(id)
+        return result
+
+    def _stock_filter(self, id: ObjectId, delta: int) -> dict:
+        return {"_id": id, "quantity": {"$gte": -delta}} if delta < 0 else {"_id": id}
+
+    async def _apply_in_transaction(self, changes: List[Tuple[ObjectId, int]]):
+        operations = [UpdateOne(self._stock_filter(id, delta), {"$inc": {"quantity": delta}}) for id, delta in changes]
+
+        async def apply(session):
+            bulk = await self.collection.bulk_write(operations, ordered=True, session=session)
+            if bulk.matched_count < len(operations):
+                raise _StockShortfall(next((index for index, (_, delta) in enumerate(changes) if delta < 0), 0))
+
+        async with self.collection.database.client.start_session() as session:
+            await session.with_transaction(apply)
+
+    # Standalone mongod: one guarded update per change, stopping at the first that
+    # matches nothing and giving back what was already applied. A concurrent
+    # request can briefly see the stock taken by a change that is then undone.
+    async def _apply_one_by_one(self, changes: List[Tuple[ObjectId, int]]):
+        for index, (id, delta) in enumerate(changes):
+            update = await self.collection.update_one(self._stock_filter(id, delta), {"$inc": {"quantity": delta}})
+            if update.matched_count == 0:
+                await self.revert_stock_changes(changes[:index])
+                raise _StockShortfall(index)
+
+    async def revert_stock_changes(self, changes: List[Tuple[ObjectId, int]]):
+        if not changes:
+            return
 
-        
\ No newline at end of file
+        await self.collection.bulk_write(
+            [UpdateOne({"_id": id}, {"$inc": {"quantity": -delta}}) for id, delta in changes],
+            ordered=False
+        )
+        for id, _ in changes:
+            self._forget(id)
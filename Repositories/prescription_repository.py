@@ -0,0 +1,115 @@
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.command_cursor import AsyncCommandCursor
+from pymongo.errors import BulkWriteError
+from pymongo.results import DeleteResult
+
+from pagination import SEEK_SORT
+from Repositories.medicine_repository import MEDICINE_DETAIL_PROJECTION
+
+
+def _medicine_object_id(path: str) -> dict:
+    return {"$convert": {"input": path, "to": "objectId", "onError": None, "onNull": None}}
+
+
+class PrescriptionRepository:
+
+    def __init__(self, collection: AsyncCollection):
+        self.collection = collection
+
+    async def get_for_doctor(self, id: ObjectId, doctor_id: ObjectId) -> Optional[dict]:
+        return await self.collection.find_one({"_id": id, "doctor_id": doctor_id})
+
+    async def list_for_doctor(self, doctor_id: ObjectId, seek: dict, limit: int, projection: Optional[dict] = None) -> List[dict]:
+        cursor = self.collection.find({"doctor_id": doctor_id, **seek}, projection).sort(SEEK_SORT).limit(limit).batch_size(limit)
+        return await cursor.to_list()
+
+    async def create(self, doc: dict) -> ObjectId:
+        result = await self.collection.insert_one(doc)
+        return result.inserted_id
+
+    # Unordered, so one bad document does not stop the rest; returns the indexes
+    # in `docs` that were not inserted.
+    async def create_many(self, docs: List[dict]) -> List[int]:
+        if not docs:
+            return []
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as bwe:
+            return sorted(error["index"] for error in bwe.details.get("writeErrors", []))
+        return []
+
+    async def update_for_doctor(self, id: ObjectId, doctor_id: ObjectId, changes: dict,
+                                projection: Optional[dict] = None) -> Optional[dict]:
+        return await self.collection.find_one_and_update(
+            {"_id": id, "doctor_id": doctor_id},
+            {"$set": changes},
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def delete_for_doctor(self, id: ObjectId, doctor_id: ObjectId) -> DeleteResult:
+        return await self.collection.delete_one({"_id": id, "doctor_id": doctor_id})
+
+    async def aggregate_for_doctor(self, doctor_id: ObjectId, seek: dict, limit: int,
+                                   medicine_collection: str) -> AsyncCommandCursor:
+        # Page first, then join: the $lookup only ever sees `limit` prescriptions.
+        # medicines.medicine_id is stored as a string, so it is converted before
+        # joining on the medicine _id; lines whose medicine no longer exists are dropped
+        # while prescriptions without medicines are kept.
+        pipeline = [
+            {"$match": {"doctor_id": doctor_id, **seek}},
+            {"$sort": dict(SEEK_SORT)},
+            {"$limit": limit},
+            {"$addFields": {
+                "medicine_oids": {"$map": {
+                    "input": {"$ifNull": ["$medicines", []]},
+                    "as": "line",
+                    "in": _medicine_object_id("$$line.medicine_id")
+                }}
+            }},
+            {"$lookup": {
+                "from": medicine_collection,
+                "localField": "medicine_oids",
+                "foreignField": "_id",
+                "pipeline": [{"$project": MEDICINE_DETAIL_PROJECTION}],
+                "as": "medicine_details"
+            }},
+            {"$project": {
+                "patient_id": 1,
+                "patient_name": 1,
+                "description": 1,
+                "completed": 1,
+                "expiry": 1,
+                "created_at": 1,
+                "medicines": {"$filter": {
+                    "input": {"$map": {
+                        "input": {"$ifNull": ["$medicines", []]},
+                        "as": "line",
+                        "in": {"$let": {
+                            "vars": {"detail": {"$arrayElemAt": [{"$filter": {
+                                "input": "$medicine_details",
+                                "as": "d",
+                                "cond": {"$eq": ["$$d._id", _medicine_object_id("$$line.medicine_id")]}
+                            }}, 0]}},
+                            "in": {
+                                "medicine_id": {"$toString": "$$detail._id"},
+                                "medicine_name": "$$detail.medicine_name",
+                                "quantity": "$$line.quantity",
+                                "expiry": "$$detail.expiry",
+                                "created_at": "$$detail.created_at"
+                            }
+                        }}
+                    }},
+                    "as": "line",
+                    "cond": {"$ne": ["$$line.medicine_id", None]}
+                }}
+            }}
+        ]
+
+        # One slot past $limit lets the first batch reach the end of the pipeline,
+        # so the server closes the cursor without a getMore or killCursors.
+        return await self.collection.aggregate(pipeline, allowDiskUse=True, batchSize=limit + 1)
@@ -0,0 +1,54 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import BulkWriteError
+from pymongo.results import UpdateResult
+
+from pagination import SEEK_SORT
+
+
+class UserRepository:
+
+    def __init__(self, collection: AsyncCollection):
+        self.collection = collection
+
+    async def get(self, id: ObjectId) -> Optional[dict]:
+        return await self.collection.find_one({"_id": id})
+
+    async def get_by_email(self, email: str) -> Optional[dict]:
+        return await self.collection.find_one({"email": email})
+
+    async def existing_emails(self, emails: Iterable[str]) -> Set[str]:
+        emails = list(emails)
+        docs = await self.collection.find({"email": {"$in": emails}}, {"email": 1, "_id": 0}).batch_size(len(emails)).to_list()
+        return {doc["email"] for doc in docs}
+
+    async def list_by_role(self, role: str, seek: dict, limit: int, projection: Optional[dict] = None) -> List[dict]:
+        cursor = self.collection.find({"role": role, **seek}, projection).sort(SEEK_SORT).limit(limit).batch_size(limit)
+        return await cursor.to_list()
+
+    async def create(self, doc: dict) -> ObjectId:
+        result = await self.collection.insert_one(doc)
+        return result.inserted_id
+
+    # Unordered insert; returns {index in docs: error code} for the documents
+    # that were not inserted.
+    async def create_many(self, docs: List[dict]) -> Dict[int, int]:
+        if not docs:
+            return {}
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as bwe:
+            return {error["index"]: error.get("code") for error in bwe.details.get("writeErrors", [])}
+        return {}
+
+    # Tokens issued before `tokens_valid_after` (epoch seconds) stop verifying.
+    async def set_password(self, id: ObjectId, hashed_password: str, tokens_valid_after: float) -> UpdateResult:
+        return await self.collection.update_one(
+            {"_id": id}, {"$set": {"password": hashed_password, "tokens_valid_after": tokens_valid_after}}
+        )
+
+    async def tokens_valid_after(self, id: ObjectId) -> float:
+        doc = await self.collection.find_one({"_id": id}, {"tokens_valid_after": 1, "_id": 0})
+        return float((doc or {}).get("tokens_valid_after", 0.0))
@@ -1,109 +1,164 @@
-from fastapi import APIRouter, status, HTTPException, Depends, Request, Body
-from pymongo.collection import Collection
-from typing import List
+from fastapi import APIRouter, status, HTTPException, Depends, Request, Body, Query
+from fastapi.responses import JSONResponse
+from typing import List, Optional
+import logging
 
-from Services.medicine_services import *
-from DB.schemas import ReadMedicine, CreateMedicine, UpdateMedicine
-from middleware import require_auth, require_role
-from configurations import get_medicine_collection
+from Services.medicine_services import (
+    alter_medicine,
+    fetch_all_medicines,
+    fetch_medicine,
+    import_medicines,
+    new_medicine,
+    remove_medicine,
+)
+from DB.schemas import ReadMedicine, CreateMedicine, UpdateMedicine, MedicinePage, MedicineImportResult
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from responses import fast_response
+from projection import parse_fields
+from instrumentation import query_budget
+from middleware import authorize
+from configurations import get_medicine_repository
+from Repositories.medicine_repository import MedicineRepository
+
+logger = logging.getLogger(__name__)
 
 medicine_router = APIRouter(    
     prefix="/nurse",
-    tags=["nurse"]
+    tags=["nurse"],
+    dependencies=[Depends(authorize)]
 )
 
 
-@medicine_router.get("/read_all_medicines", response_model = List[ReadMedicine], status_code=status.HTTP_200_OK)
-@require_role
-@require_auth
+@medicine_router.get("/read_all_medicines", response_model = MedicinePage, status_code=status.HTTP_200_OK)
+@query_budget(1)
 async def read_all_medicines(
     request: Request,
-    collection: Collection = Depends(get_medicine_collection)
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated ReadMedicine fields to return"),
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
 ):
 
     try:
-        logger.info("Reading all medicine.........")
+        logger.debug("Reading all medicine.........")
         nurse_id = request.state.user_id
-        read_all = fetch_all_medicines(nurse_id, collection)
-        return read_all
+        read_all = await fetch_all_medicines(nurse_id, medicine_repo, cursor, limit, parse_fields(fields, ReadMedicine))
+        return fast_response(read_all)
 
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"reading_all_medicines: Internal Issue: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
 
 @medicine_router.get("/read_medicine_by_id/{id}", response_model=ReadMedicine, status_code=status.HTTP_200_OK)
-@require_role
-@require_auth
+@query_budget(1)
 
 async def read_medicine_by_id(
     request: Request,
     id: str, 
-    collection: Collection = Depends(get_medicine_collection)
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
 ):
     try:
-        logger.info("Reading medicine.........")
+        logger.debug("Reading medicine.........")
         nurse_id = request.state.user_id
-        read_all = fetch_medicine(id, collection, nurse_id)
+        read_all = await fetch_medicine(id, medicine_repo, nurse_id)
         return read_all
     
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"reading_medicine: Internal Issue: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
 
 @medicine_router.post("/create_medicine", status_code=status.HTTP_201_CREATED)
-@require_role
-@require_auth
+@query_budget(1)
 async def create_medicine(
     request: Request,
     create: CreateMedicine = Body(...), 
-    collection: Collection = Depends(get_medicine_collection)
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
 ):
     try:
-        logger.info("Creating medicine.........")
+        logger.debug("Creating medicine.........")
         nurse_id = request.state.user_id
-        created = new_medicine(create, collection, nurse_id)
+        created = await new_medicine(create, medicine_repo, nurse_id)
         return created
     
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"creating_medicine: Internal Issue: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
 
+# No fixed budget: one bulk write per IMPORT_CHUNK_SIZE distinct lots, so it grows with the file.
+@medicine_router.post("/import_medicines", response_model=MedicineImportResult, status_code=status.HTTP_200_OK)
+@query_budget(None)
+async def import_medicine_rows(
+    request: Request,
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        fmt = "csv"
+    elif content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json"):
+        fmt = "ndjson"
+    else:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+
+    try:
+        logger.debug("Importing medicines (%s).........", fmt)
+        nurse_id = request.state.user_id
+        result = await import_medicines(request.stream(), fmt, medicine_repo, nurse_id)
+        if result.error is not None:
+            return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content=result.dict())
+        return result
+
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.error(f"importing_medicines: Internal Issue: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+    
+
 @medicine_router.put("/update_medicine_by_id/{id}", response_model=ReadMedicine, status_code=status.HTTP_200_OK)
-@require_role
-@require_auth
+@query_budget(1)
 async def update_medicine_by_id(
     request: Request,
     id: str,
     update: UpdateMedicine = Body(...), 
-    collection: Collection = Depends(get_medicine_collection)
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
 ):
     try:
-        logger.info("Updating medicine.........")
+        logger.debug("Updating medicine.........")
         nurse_id = request.state.user_id
-        update = alter_medicine(id, update ,collection, nurse_id)
+        update = await alter_medicine(id, update, medicine_repo, nurse_id)
         return update
     
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"updating_medicine: Internal Issue: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-@medicine_router.delete("/delete_medicine_by_id/{id}", response_model=ReadMedicine, status_code=status.HTTP_200_OK)
-@require_role
-@require_auth
+@medicine_router.delete("/delete_medicine_by_id/{id}", status_code=status.HTTP_200_OK)
+@query_budget(1)
 async def delete_medicine_by_id(
     request: Request,
-    collection: Collection = Depends(get_medicine_collection)
+    id: str,
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
 ):
     try:
-        logger.info("Deleting medicine.........")
+        logger.debug("Deleting medicine.........")
         nurse_id = request.state.user_id
-        deleted = remove_medicine(id, deleted ,collection, nurse_id)
+        deleted = await remove_medicine(id, medicine_repo, nurse_id)
         return deleted      
     
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"updating_medicine: Internal Issue: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,44 +1,88 @@
-from fastapi import APIRouter, Body, Depends, Request, HTTPException, status
-from pymongo.collection import Collection #type: ignore
+from fastapi import APIRouter, Body, Depends, Request, HTTPException, status, Query
+from typing import Optional
 import logging
 
 
-from DB.schemas import CreatePrescription
-from configurations import get_prescription_collection, get_medicine_collection
-from Services.prescription_services import *
-from middleware import require_auth, require_role
+from DB.schemas import (
+    CreatePrescription,
+    CreatePrescriptionBatch,
+    PrescriptionBatchResult,
+    PrescriptionOut,
+    PrescriptionPage,
+    ReadPrescription,
+    UpdatePrescription,
+)
+from configurations import get_prescription_repository, get_medicine_repository
+from Repositories.medicine_repository import MedicineRepository
+from Repositories.prescription_repository import PrescriptionRepository
+from Services.prescription_services import (
+    alter_prescription,
+    fetch_prescription,
+    fetch_prescription_by_id,
+    new_prescription,
+    new_prescriptions,
+    remove_prescription,
+)
+from instrumentation import query_budget
+from middleware import authorize
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from responses import fast_response
+from projection import parse_fields
 
 logger = logging.getLogger(__name__)
 
 prescription_crud_route = APIRouter( 
     prefix="/doctor",
-    tags=["doctor"]
+    tags=["doctor"],
+    dependencies=[Depends(authorize)]
     )
 
 
 @prescription_crud_route.post("/create_prescription", status_code=status.HTTP_201_CREATED)
-@require_auth     
-@require_role  
+@query_budget(4)
 async def create_prescription(
     request: Request,
     create: CreatePrescription = Body(...), 
-    prescription_collection: Collection = Depends(get_prescription_collection),
-    medicine_collection: Collection = Depends(get_medicine_collection)
+    prescription_repo: PrescriptionRepository = Depends(get_prescription_repository),
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
 ):
 
     
     try:
-        logger.info("Creating Prescription")
+        logger.debug("Creating Prescription")
         user_id = request.state.user_id
-        created_prescription = new_prescription(create, prescription_collection, user_id, medicine_collection)
+        created_prescription = await new_prescription(create, prescription_repo, user_id, medicine_repo)
         return created_prescription
     
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"create_prescription: Internal issue: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
 
 
+@prescription_crud_route.post("/create_prescriptions", response_model=PrescriptionBatchResult, status_code=status.HTTP_200_OK)
+@query_budget(5)
+async def create_prescriptions(
+    request: Request,
+    batch: CreatePrescriptionBatch = Body(...),
+    prescription_repo: PrescriptionRepository = Depends(get_prescription_repository),
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
+):
+    try:
+        logger.debug("Creating %s prescriptions", len(batch.prescriptions))
+        user_id = request.state.user_id
+        return await new_prescriptions(batch, prescription_repo, user_id, medicine_repo)
+
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.error(f"create_prescriptions: Internal issue: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+
 # @prescription_crud_route.get("/read_prescription_by_id/{id}", response_model=ReadPrescription ,status_code=status.HTTP_200_OK)
 # @require_auth      
 # @require_role  
@@ -58,37 +102,46 @@ async def create_prescription(
 #         raise HTTPException(status_code=500, detail="Internal Server Error")     
 
 @prescription_crud_route.get("/read_prescription_by_id/{id}", response_model=ReadPrescription, status_code=status.HTTP_200_OK)
-@require_auth      
-@require_role  
+@query_budget(2)
 async def read_prescription_by_id(
     request: Request,
     id: str,
-    prescription_collection: Collection = Depends(get_prescription_collection),
-    medicine_collection: Collection = Depends(get_medicine_collection)  
+    prescription_repo: PrescriptionRepository = Depends(get_prescription_repository),
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)  
 ):
     try:
-        logger.info("Reading prescription....")
+        logger.debug("Reading prescription....")
         user_id = request.state.user_id
-        read_prescription = fetch_prescription_by_id(id, prescription_collection, medicine_collection, user_id)  
+        read_prescription = await fetch_prescription_by_id(id, prescription_repo, medicine_repo, user_id)
         return read_prescription
     
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"reading_prescription: Internal issue: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
 
 
-@prescription_crud_route.get("/read_all_prescriptions", response_model=List[ReadPrescription], status_code=status.HTTP_200_OK, tags=["doctor"])
-@require_auth     
-@require_role  
-async def read_all_prescriptions( request: Request, prescription_collection: Collection = Depends(get_prescription_collection)):
+@prescription_crud_route.get("/read_all_prescriptions", response_model=PrescriptionPage, status_code=status.HTTP_200_OK, tags=["doctor"])
+@query_budget(1)
+async def read_all_prescriptions(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated ReadPrescription fields to return"),
+    prescription_repo: PrescriptionRepository = Depends(get_prescription_repository)
+):
     
     try:
-        logger.info("Reading all prescriptions....")
+        logger.debug("Reading all prescriptions....")
         user_id = request.state.user_id
-        read_prescription = fetch_prescription(prescription_collection, user_id)
-        return read_prescription
+        read_prescription = await fetch_prescription(prescription_repo, user_id, cursor, limit,
+                                                     parse_fields(fields, ReadPrescription))
+        return fast_response(read_prescription)
     
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"reading_prescription: Internal issue: {e}")
         raise HTTPException(status_code=500, detail="Prescription not found")
@@ -96,41 +149,43 @@ async def read_all_prescriptions( request: Request, prescription_collection: Col
 
 
 @prescription_crud_route.put("/update_prescription_by_id/{id}", response_model=PrescriptionOut, status_code = status.HTTP_200_OK)
-@require_auth      
-@require_role  
+@query_budget(4)
 async def update_prescription(
     request: Request,
     id: str,
     update_data: UpdatePrescription,
-    prescription_collection: Collection = Depends(get_prescription_collection),
-    medicine_collection: Collection = Depends(get_medicine_collection)
+    prescription_repo: PrescriptionRepository = Depends(get_prescription_repository),
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
 ):
     try:
-        logger.info("Updating prescription.........")
+        logger.debug("Updating prescription.........")
         user_id = request.state.user_id
-        update = alter_prescription(id, update_data ,prescription_collection, user_id, medicine_collection)
+        update = await alter_prescription(id, update_data, prescription_repo, user_id, medicine_repo)
         return update
     
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"updating_prescription: Internal Issue: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
     
 
 @prescription_crud_route.delete("/delete_prescription_by_id/{id}",status_code= status.HTTP_200_OK)
-@require_auth      # ← Changed order
-@require_role  
+@query_budget(1)
 async def delete_prescriptions(
     request: Request,
     id: str,
-    prescription_collection: Collection = Depends(get_prescription_collection)
+    prescription_repo: PrescriptionRepository = Depends(get_prescription_repository)
 ):
     
     try:
-        logger.info("Deleting prescriptions..")
+        logger.debug("Deleting prescriptions..")
         user_id = request.state.user_id
-        delete = remove_prescription(id, prescription_collection, user_id)
+        delete = await remove_prescription(id, prescription_repo, user_id)
         return delete
     
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"updating_prescription: Internal Issue: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
@@ -1,28 +1,50 @@
-from psycopg2 import DatabaseError
-from pymongo.collection import Collection #type: ignore
-from fastapi import APIRouter, Depends, Request, status, HTTPException
-
-
-from authentication import *
-from middleware import *
-from Services.user_services import *
-from Services.staff_services import *
-from DB.schemas import  UserOut, UserCreate
-from configurations import get_medicine_collection, get_prescription_collection, get_user_collection
-
-staff_router = APIRouter()
+from fastapi import APIRouter, Depends, Request, status, HTTPException, Query
+from pymongo.errors import PyMongoError
+from typing import Optional
+import logging
+
+
+from instrumentation import query_budget
+from middleware import authorize
+from Services.staff_services import (
+    aggr_fetch_prescription,
+    fetch_doctors,
+    fetch_nurses,
+    fetch_prescription,
+    insert_doctor,
+    insert_nurse,
+    onboard_staff,
+    parse_staff_rows,
+    update_doctor_password,
+    update_nurse_password,
+)
+from DB.schemas import  UserOut, UserCreate, PasswordUpdate, PrescriptionPage, ReadPrescription, UserPage, StaffOnboardResult
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from responses import fast_response
+from projection import parse_fields
+from configurations import get_medicine_repository, get_prescription_repository, get_user_repository
+from Repositories.medicine_repository import MedicineRepository
+from Repositories.prescription_repository import PrescriptionRepository
+from Repositories.user_repository import UserRepository
+
+logger = logging.getLogger(__name__)
+
+staff_router = APIRouter(dependencies=[Depends(authorize)])
 
 
 @staff_router.post("/management/create_doctor",  status_code=status.HTTP_200_OK, tags=["management"])
-@require_role
+@query_budget(2)
 async def create_doctor(
     request: Request,
-    doctor: UserCreate
+    doctor: UserCreate,
+    user_repo: UserRepository = Depends(get_user_repository)
 ):
 
     try:
-        added_doctor = insert_doctor(doctor, user_collection)
+        added_doctor = await insert_doctor(doctor, user_repo)
         return added_doctor
+    except HTTPException as http_exc:
+            raise http_exc
     except Exception as db_err:
             logger.exception(f"create_doctor: Failed to create doctor {db_err}")
             raise HTTPException(status_code=500, detail="Failed to create doctor")
@@ -34,15 +56,18 @@ async def create_doctor(
 
 
 @staff_router.post("/management/create_nurse",  status_code=status.HTTP_200_OK, tags=["management"])
-@require_role
+@query_budget(2)
 async def create_nurse(
     request: Request,
-    nurse: UserCreate
+    nurse: UserCreate,
+    user_repo: UserRepository = Depends(get_user_repository)
 ):     
     try:
-        added_nurse = insert_nurse(nurse, user_collection)
+        added_nurse = await insert_nurse(nurse, user_repo)
         return added_nurse
-    except DatabaseError as db_err:  
+    except HTTPException as http_exc:
+        raise http_exc
+    except PyMongoError as db_err:  
         logger.exception(f"create_nurse: Failed to create nurse {db_err}")
         raise HTTPException(status_code=500, detail="Failed to create nurse")
     except Exception as e: 
@@ -51,19 +76,47 @@ async def create_nurse(
     
 
 
-@staff_router.get("/fetch_prescriptions_from_doctor_id/{doctor_id}", response_model=List[ReadPrescription], status_code=status.HTTP_200_OK, tags=["management"])
-@require_auth
-@require_role
+@staff_router.post("/management/onboard_staff", response_model=StaffOnboardResult, status_code=status.HTTP_200_OK, tags=["management"])
+@query_budget(2)
+async def onboard_staff_members(
+    request: Request,
+    user_repo: UserRepository = Depends(get_user_repository)
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        fmt = "csv"
+    elif content_type == "application/json":
+        fmt = "json"
+    else:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/json")
+
+    try:
+        rows = parse_staff_rows(await request.body(), fmt)
+        return await onboard_staff(rows, user_repo)
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.exception(f"onboard_staff: Unexpected error: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+
+@staff_router.get("/fetch_prescriptions_from_doctor_id/{doctor_id}", response_model=PrescriptionPage, status_code=status.HTTP_200_OK, tags=["management"])
+@query_budget(2)
 async def fetch_prescriptions_from_doctor_id(
     request: Request,
     doctor_id: str,
-    prescription_collection: Collection = Depends(get_prescription_collection),
-    medicine_collection: Collection = Depends(get_medicine_collection)
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated ReadPrescription fields to return"),
+    prescription_repo: PrescriptionRepository = Depends(get_prescription_repository),
+    medicine_repo: MedicineRepository = Depends(get_medicine_repository)
 ):
     try:
-        logger.info(f"Endpoint called with doctor_id: {doctor_id}")  
-        prescriptions = fetch_prescription(doctor_id, prescription_collection, medicine_collection)
-        return prescriptions
+        logger.debug("Endpoint called with doctor_id: %s", doctor_id)  
+        prescriptions = await fetch_prescription(doctor_id, prescription_repo, medicine_repo, cursor, limit,
+                                                 parse_fields(fields, ReadPrescription))
+        return fast_response(prescriptions)
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -72,19 +125,20 @@ async def fetch_prescriptions_from_doctor_id(
     
 
 
-@staff_router.get("/fetch_pres_from_dr_arg/{doctor_id}", response_model=List[ReadPrescription], status_code=status.HTTP_200_OK, tags=["management"])
-@require_auth
-@require_role
+@staff_router.get("/fetch_pres_from_dr_arg/{doctor_id}", response_model=PrescriptionPage, status_code=status.HTTP_200_OK, tags=["management"])
+@query_budget(1)
 async def agg_fetch_pres(
         request: Request,
         doctor_id: str,
-        prescription_collection: Collection = Depends(get_prescription_collection),
-        medicine_collection: Collection = Depends(get_medicine_collection)
+        cursor: Optional[str] = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        prescription_repo: PrescriptionRepository = Depends(get_prescription_repository),
+        medicine_repo: MedicineRepository = Depends(get_medicine_repository)
 ):
     try:
-        logger.info("Endpoint called with doctor_id: {doctor_id}")
-        prescriptions = aggr_fetch_prescription(doctor_id, prescription_collection, medicine_collection)
-        return prescriptions
+        logger.debug("Endpoint called with doctor_id: %s", doctor_id)
+        prescriptions = await aggr_fetch_prescription(doctor_id, prescription_repo, medicine_repo, cursor, limit)
+        return fast_response(prescriptions)
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -93,24 +147,38 @@ async def agg_fetch_pres(
     
 
 
-@staff_router.get("/read_all_doctors", response_model=List[UserOut], status_code=status.HTTP_200_OK)
+@staff_router.get("/read_all_doctors", response_model=UserPage, status_code=status.HTTP_200_OK, tags=["management"])
+@query_budget(1)
 async def read_all_doctors(
-    user_collection: Collection = Depends(get_user_collection)
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated UserOut fields to return"),
+    user_repo: UserRepository = Depends(get_user_repository)
 ):
     try:
-        read_all = fetch_doctors(user_collection)
-        return read_all
+        read_all = await fetch_doctors(user_repo, cursor, limit, parse_fields(fields, UserOut))
+        return fast_response(read_all)
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"read_all_doctors: Internal issue: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
 
 
-@staff_router.get("/read_all_nurses", response_model=List[UserOut], status_code=status.HTTP_200_OK)
-async def read_all_nurses(user_collection: Collection = Depends(get_user_collection)):
+@staff_router.get("/read_all_nurses", response_model=UserPage, status_code=status.HTTP_200_OK, tags=["management"])
+@query_budget(1)
+async def read_all_nurses(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated UserOut fields to return"),
+    user_repo: UserRepository = Depends(get_user_repository)
+):
     try:
-        read_all = fetch_nurses(user_collection)
-        return read_all
+        read_all = await fetch_nurses(user_repo, cursor, limit, parse_fields(fields, UserOut))
+        return fast_response(read_all)
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"read_all_nurses: Internal Issue: {e}")
         raise HTTPException(status_code=500, detail="Internal Server error")
@@ -119,31 +187,32 @@ async def read_all_nurses(user_collection: Collection = Depends(get_user_collect
     
 
 @staff_router.put("/doctor/change_doctor_password", status_code=status.HTTP_200_OK, tags=["doctor"])
-@require_role
-@require_auth
+@query_budget(2)
 async def change_doctor_password(
     request: Request,  
     payload: PasswordUpdate,
-    user_collection: Collection = Depends(get_user_collection)
+    user_repo: UserRepository = Depends(get_user_repository)
 ):
     try:
-        logger.info("Password change request received")
+        logger.debug("Password change request received")
 
         doctor_id = request.state.user_id
-        logger.info(f"doctor_id: {doctor_id}")
+        logger.debug("doctor_id: %s", doctor_id)
         if not doctor_id:
             logger.error("No user_id found in request state")
             raise HTTPException(status_code=401, detail="Authentication required")
         
-        result = update_doctor_password(
-            collect=user_collection,
+        result = await update_doctor_password(
+            user_repo=user_repo,
             password_data=payload,
             doctor_id=doctor_id
         )
         
-        logger.info(f"Password change completed successfully for doctor_id={doctor_id}")
+        logger.debug("Password change completed successfully for doctor_id=%s", doctor_id)
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"change_doctor_password: Unexpected error..........: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -151,29 +220,30 @@ async def change_doctor_password(
 
 
 @staff_router.put("/nurse/change_nurse_password", status_code=status.HTTP_200_OK, tags=["nurse"])
-@require_role
-@require_auth
+@query_budget(2)
 async def change_nurse_password(
      request: Request, 
      payload: PasswordUpdate,
-     user_collection: Collection = Depends(get_user_collection)
+     user_repo: UserRepository = Depends(get_user_repository)
     ):
         try:
-            logger.info("Password change request received")
+            logger.debug("Password change request received")
             nurse_id = request.state.user_id
             if not nurse_id:
                 logger.error("No user_id found in request state")
                 raise HTTPException(status_code=401, detail="Authentication required")
         
-            result = update_nurse_password(
-            collect=user_collection,
+            result = await update_nurse_password(
+            user_repo=user_repo,
             password_data=payload,
             nurse_id=nurse_id
         )
         
-            logger.info(f"Password change completed successfully for nurse_id={nurse_id}")
+            logger.debug("Password change completed successfully for nurse_id=%s", nurse_id)
             return result
         
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"change_nurse_password: Unexpected error..........: {e}")
             raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,28 +1,37 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import Annotated
-from jwt import ExpiredSignatureError
+import logging
 
-from authentication import *
-from middleware import *
-from Services.user_services import *
+from authentication import hash_pwd_async, oauth2_scheme, verify_password_async
+from instrumentation import query_budget
+from middleware import InvalidToken, TokenExpired, authorize, create_access_token, verify_token
+from Services.user_services import create_user, get_user_by_email
+from DB.models import Users
 from DB.schemas import Login, UserOut, UserCreate
+from configurations import get_user_repository
+from Repositories.user_repository import UserRepository
+
+logger = logging.getLogger(__name__)
 
 user_auth_route = APIRouter()
 
-def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+async def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    user_repo: UserRepository = Depends(get_user_repository)
+):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = verify_token(token)
         user_id : str = payload.get("user_id")
         email: str = payload.get("email")
-        user = get_user_by_email(email)
+        user = await get_user_by_email(email, user_repo)
 
         return user
 
-    except ExpiredSignatureError:
+    except TokenExpired:
         logger.error(f"get_current_user: Token expired")
         raise HTTPException(status_code=401, detail="Token expired")
     
-    except JWTError:
+    except InvalidToken:
         logger.error(f"get_current_user: Token is invalid")
         raise HTTPException(status_code=401, detail="Invalid token")
     
@@ -30,17 +39,18 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
 
 
 @user_auth_route.post("/login")
-def login(login_data: Login):
+@query_budget(1)
+async def login(login_data: Login, user_repo: UserRepository = Depends(get_user_repository)):
     try: 
-        db_user = get_user_by_email(login_data.email)
+        db_user = await get_user_by_email(login_data.email, user_repo)
         if not db_user:
             raise HTTPException(status_code=401, detail="Incorrect username or password")
         
-        if not verify_password(login_data.password, db_user["password"]):
+        if not await verify_password_async(login_data.password, db_user["password"]):
             raise HTTPException(status_code=401, detail="Incorrect username or password")
     
        
-        logger.info(f"login: Creating Token....")
+        logger.debug("login: Creating Token....")
 
         token_data = {
             "email": db_user["email"],
@@ -58,28 +68,30 @@ def login(login_data: Login):
         role=db_user.get("role")
         )
 
-        logger.info(f"login: User '{login_data.email}' logged in successfully")
+        logger.debug("login: User '%s' logged in successfully", login_data.email)
         return {"user": user_out, "access_token": access_token, "token_type": "bearer"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"login: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 
-@user_auth_route.post("/register", response_model=UserOut)
-@require_role
-def register(user: UserCreate, request: Request):
+@user_auth_route.post("/register", response_model=UserOut, tags=["management"], dependencies=[Depends(authorize)])
+@query_budget(2)
+async def register(request: Request, user: UserCreate, user_repo: UserRepository = Depends(get_user_repository)):
 
     try:
-        existing_user = get_user_by_email(user.email)
+        existing_user = await get_user_by_email(user.email, user_repo)
         if existing_user:
             logger.exception(f"register: email already exists")
             raise HTTPException(status_code=409, detail="email already exists")
         
         try:
-            logger.info(f"register: hashing the password.......")
-            hashed_pw = hash_pwd(user.password)
+            logger.debug("register: hashing the password.......")
+            hashed_pw = await hash_pwd_async(user.password)
         except ValueError as val_err:
             logger.exception(f"register: Password hashing failed: {val_err}")
             raise HTTPException(status_code=500, detail="Password hashing failed")
@@ -92,23 +104,27 @@ def register(user: UserCreate, request: Request):
         )
 
         try:
-            logger.info(f"Register: Creating user...")
-            created_user = create_user(new_user)
+            logger.debug("Register: Creating user...")
+            created_user = await create_user(new_user, user_repo)
 
             if created_user:
-                logging.info("User Created Successfully...")
+                logger.info("User Created Successfully...")
 
                 return UserOut(
                     username=created_user['username'],
                     email=created_user['email'],
                     is_active=created_user['is_active'],
-                    role=created_user("role")
+                    role=created_user["role"]
                 )
 
+        except HTTPException:
+            raise
         except Exception as db_err:
             logger.exception(f"register: Failed to create user {user.username}: {db_err}")
             raise HTTPException(status_code=500, detail="Failed to create user")
         
+    except HTTPException:
+        raise
     except Exception as e: 
         logger.exception(f"Unexpected error during registration: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
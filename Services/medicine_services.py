@@ -1,51 +1,115 @@
 from fastapi import APIRouter, status, HTTPException, Depends, Request
-from pymongo.collection import Collection
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
+import codecs
+import csv
+import json
 import logging
-from typing import List
-from pymongo.errors import PyMongoError
-from datetime import datetime
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Set, Union
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from datetime import datetime, timezone
 
 
-from DB.schemas import ReadMedicine, CreateMedicine, UpdateMedicine
+from DB.schemas import ReadMedicine, CreateMedicine, UpdateMedicine, MedicinePage, MedicineImportError, MedicineImportResult
+from Repositories.medicine_repository import MedicineRepository
+from pagination import DEFAULT_PAGE_SIZE, seek_filter, split_page
+from projection import projection_for, sparse_page
+from settings import get_settings
 
 
-logger = logging.getLogger(__name__)  
+logger = logging.getLogger(__name__)
 
+IMPORT_CHUNK_SIZE = get_settings().medicine_import_chunk_size
+IMPORT_MAX_LINE_BYTES = 64 * 1024
+IMPORT_MAX_REPORTED_ERRORS = 100
 
 
-def fetch_all_medicines(nurse_id: str, collect: Collection) -> List[ReadMedicine]:
+async def fetch_medicine_details(medicine_repo: MedicineRepository, medicine_lines: List[dict]) -> dict:
+    medicine_ids = set()
+    for med in medicine_lines:
+        try:
+            medicine_ids.add(ObjectId(med.get("medicine_id")))
+        except (InvalidId, TypeError) as e:
+            logger.warning(f"Error processing medicine: {e}")
+
+    if not medicine_ids:
+        return {}
+
+    try:
+        details = await medicine_repo.get_details(medicine_ids)
+    except PyMongoError as db_err:
+        logger.error(f"fetch_medicine_details: Database error {db_err}")
+        raise HTTPException(status_code=500, detail=f"Database error occurred: {db_err}")
+
+    return details
+
+
+def resolve_medicines(medicine_lines: List[dict], details: dict) -> List[dict]:
+    medicines_with_details = []
+    for med in medicine_lines:
+        try:
+            med_id = ObjectId(med.get("medicine_id"))
+        except (InvalidId, TypeError):
+            continue
+
+        medicine_doc = details.get(med_id)
+        if not medicine_doc:
+            logger.warning(f"Medicine with ID {med_id} not found")
+            continue
+
+        medicines_with_details.append({
+            "medicine_name": medicine_doc.get("medicine_name"),
+            "quantity": med.get("quantity"),
+            "expiry": medicine_doc.get("expiry"),
+            "created_at": medicine_doc.get("created_at")
+        })
+
+    return medicines_with_details
+
+
+READ_MEDICINE_PROJECTION = projection_for(ReadMedicine)
+
+
+async def fetch_all_medicines(nurse_id: str, medicine_repo: MedicineRepository, cursor: Optional[str] = None,
+                              limit: int = DEFAULT_PAGE_SIZE, fields: Optional[Set[str]] = None) -> Union[MedicinePage, JSONResponse]:
     try:
         nid = ObjectId(nurse_id)
     except InvalidId:
         raise HTTPException(status_code=404, detail="Invalid Id Format")
     
     try:
-        fetch = list(collect.find({"nurse_id": nid}))
+        fetch = await medicine_repo.list_for_nurse(nid, seek_filter(cursor), limit + 1,
+                                                   projection_for(ReadMedicine, fields=fields) if fields else READ_MEDICINE_PROJECTION)
 
     except PyMongoError as db_err:
         logger.error(f"read_all_medicine: Database error {db_err}")
         raise HTTPException(status_code=500, detail="Database error occurred:")
-    except Exception as e:
-        logger.error(f"read_all_medicine: An unexpected error occurred: {e}")
 
-    if not fetch:
+    if not fetch and not cursor:
         raise HTTPException(status_code=400, detail="No medicine found in databse")
-    
-    return [
-         ReadMedicine(
-            medicine_id=str(f["_id"]),  
-            medicine_name=f.get("medicine_name", ""),  # ← Change to medicine_name
-            quantity=f.get("quantity"),
-            expiry=f.get("expiry"),
-            created_at=f.get("created_at")
-)
-        for f in fetch
-    ]
+
+    fetch, next_cursor = split_page(fetch, limit)
+    if fields:
+        return sparse_page(fetch, next_cursor, fields)
+    return MedicinePage(
+        items=[
+            ReadMedicine(
+                medicine_id=str(f["_id"]),
+                medicine_name=f.get("medicine_name", ""),
+                quantity=f.get("quantity"),
+                expiry=f.get("expiry"),
+                created_at=f.get("created_at")
+            )
+            for f in fetch
+        ],
+        next_cursor=next_cursor
+    )
     
 
-def fetch_medicine(id: str, collect: Collection, nurse_id) -> ReadMedicine:
+async def fetch_medicine(id: str, medicine_repo: MedicineRepository, nurse_id) -> ReadMedicine:
     try:
         object_id = ObjectId(id)
         nid = ObjectId(nurse_id)
@@ -54,17 +118,14 @@ def fetch_medicine(id: str, collect: Collection, nurse_id) -> ReadMedicine:
         raise HTTPException(status_code=404, detail="Invalid Id Format")
     
     try:
-        doc = collect.find_one({"_id": object_id, "nurse_id": nid})
-        if not doc:
-            raise HTTPException(status_code=400, detail="No medicine found in database")
+        doc = await medicine_repo.get_for_nurse(object_id, nid)
     except PyMongoError as db_err:
         logger.error(f"read_all_medicine: Database error {db_err}")
         raise HTTPException(status_code=500, detail="Database error occurred:")
-    except Exception as e:
-        logger.error(f"read_all_medicine: An unexpected error occurred: {e}")
 
-        
-        
+    if not doc:
+        raise HTTPException(status_code=400, detail="No medicine found in database")
+
     return ReadMedicine(
     medicine_id=str(doc["_id"]),  
     medicine_name=doc.get("medicine_name", ""),  # ← Change to medicine_name
@@ -74,14 +135,14 @@ def fetch_medicine(id: str, collect: Collection, nurse_id) -> ReadMedicine:
 )
 
 
-def new_medicine(new_medicine: CreateMedicine, collect: Collection, nurse_id) -> ReadMedicine:
+async def new_medicine(new_medicine: CreateMedicine, medicine_repo: MedicineRepository, nurse_id) -> ReadMedicine:
     try:
         nid = ObjectId(nurse_id)
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid Id Format")
     
     try:
-        logger.info("new_medicine: Adding new data.....")
+        logger.debug("new_medicine: Adding new data.....")
         data = new_medicine.dict()
         
         data.update({
@@ -89,10 +150,10 @@ def new_medicine(new_medicine: CreateMedicine, collect: Collection, nurse_id) ->
             "nurse_id": nid
         })
 
-        result = collect.insert_one(data)
-
-        doc = collect.find_one({"_id": result.inserted_id})
+        inserted_id = await medicine_repo.create(data)
 
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A lot with this medicine name and expiry already exists")
     except PyMongoError as db_err:
         logger.error(f"Database error: {db_err}")
         raise HTTPException(status_code=500, detail=f"Database error occurred: {db_err}")
@@ -100,22 +161,18 @@ def new_medicine(new_medicine: CreateMedicine, collect: Collection, nurse_id) ->
         logger.error(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
-    if not doc:
-        logger.error("Failed to fetch created medicine")
-        raise HTTPException(status_code=500, detail="Failed to fetch created medicine")
-
     return ReadMedicine(
-    medicine_id=str(doc["_id"]),  
-    medicine_name=doc.get("medicine_name", ""),  # ← Change to medicine_name
-    quantity=doc.get("quantity"),
-    expiry=doc.get("expiry"),
-    created_at=doc.get("created_at")
+    medicine_id=str(inserted_id),  
+    medicine_name=data.get("medicine_name", ""),
+    quantity=data.get("quantity"),
+    expiry=data.get("expiry"),
+    created_at=data.get("created_at")
 )
 
 
 
 
-def alter_medicine(id: str, alter_data: UpdateMedicine, collect: Collection, nurse_id: str) -> ReadMedicine:
+async def alter_medicine(id: str, alter_data: UpdateMedicine, medicine_repo: MedicineRepository, nurse_id: str) -> ReadMedicine:
     try:
         object_id = ObjectId(id)
         nid = ObjectId(nurse_id)
@@ -128,9 +185,11 @@ def alter_medicine(id: str, alter_data: UpdateMedicine, collect: Collection, nur
         raise HTTPException(status_code=400, detail="No data provided for update")
 
     try:
-        logger.info("alter_medicine: updating the dictionary.....")
-        result = collect.update_one({"_id": object_id, "nurse_id": nid}, {"$set": update_dict})
+        logger.debug("alter_medicine: updating the dictionary.....")
+        doc = await medicine_repo.update_for_nurse(object_id, nid, update_dict)
 
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A lot with this medicine name and expiry already exists")
     except PyMongoError as db_err:
         logger.exception(f"Database error during update: {db_err}")
         raise HTTPException(status_code=500, detail=f"Database error occurred: {db_err}")
@@ -138,15 +197,10 @@ def alter_medicine(id: str, alter_data: UpdateMedicine, collect: Collection, nur
         logger.exception(f"Unexpected error during update: {e}")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Medicine not found or not authorized")
-
-
-    doc = collect.find_one({"_id": object_id, "nurse_id": nid})
     if not doc:
-        raise HTTPException(status_code=404, detail="Medicine not found after update")
+        raise HTTPException(status_code=404, detail="Medicine not found or not authorized")
 
-    logger.info("alter_medicine: Updated successfully")
+    logger.debug("alter_medicine: Updated successfully")
     return ReadMedicine(
     medicine_id=str(doc["_id"]),  
     medicine_name=doc.get("medicine_name", ""),  # ← Change to medicine_name
@@ -157,7 +211,7 @@ def alter_medicine(id: str, alter_data: UpdateMedicine, collect: Collection, nur
 
 
 
-def remove_medicine(id: str, collect: Collection, nurse_id: str) -> dict:
+async def remove_medicine(id: str, medicine_repo: MedicineRepository, nurse_id: str) -> dict:
     try:
         object_id = ObjectId(id)
         nid = ObjectId(nurse_id)
@@ -165,7 +219,7 @@ def remove_medicine(id: str, collect: Collection, nurse_id: str) -> dict:
         raise HTTPException(status_code=400, detail="Invalid Id Format")
     
     try:
-        result = collect.delete_one({"_id": object_id, "nurse_id": nid})
+        result = await medicine_repo.delete_for_nurse(object_id, nid)
         
     except PyMongoError as db_err:
         logger.exception(f"Database error during medicine deletion: {db_err}")
@@ -179,3 +233,190 @@ def remove_medicine(id: str, collect: Collection, nurse_id: str) -> dict:
     
     logger.info(f"remove_medicine: Medicine {id} deleted successfully")
     return {"message": "Medicine deleted successfully"}
+
+
+
+# Stands in for a line longer than IMPORT_MAX_LINE_BYTES, whose text was dropped
+# as it streamed in. Its quote count is kept so CSV records still split correctly.
+@dataclass
+class _LongLine:
+    quotes: int = 0
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Union[str, _LongLine]]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    long_line = None
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if long_line is not None:
+                long_line.quotes += line.count('"')
+                yield long_line
+                long_line = None
+            else:
+                yield line.rstrip("\r")
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            long_line = long_line or _LongLine()
+            long_line.quotes += buffer.count('"')
+            buffer = ""
+
+    buffer += decoder.decode(b"", final=True)
+    if long_line is not None:
+        long_line.quotes += buffer.count('"')
+        yield long_line
+    elif buffer:
+        yield buffer.rstrip("\r")
+
+
+# Joins physical lines into CSV records: while a record has an odd number of
+# quote characters a quoted field is still open, so the next line belongs to it.
+# A record over IMPORT_MAX_LINE_BYTES is dropped, still counting quotes to find
+# its end. Yields (first line number, record, error).
+async def iter_csv_records(lines: AsyncIterator[Union[str, _LongLine]]) -> AsyncIterator[tuple]:
+    line_no = 0
+    start = 0
+    pending = []
+    size = 0
+    quotes = 0
+    async for line in lines:
+        line_no += 1
+        if not size:
+            start = line_no
+        if isinstance(line, _LongLine):
+            size += IMPORT_MAX_LINE_BYTES + 1
+            quotes += line.quotes
+        else:
+            size += len(line) + 1
+            quotes += line.count('"')
+        if size <= IMPORT_MAX_LINE_BYTES:
+            pending.append(line)
+        else:
+            pending = []
+
+        if quotes % 2 == 0:
+            if size <= IMPORT_MAX_LINE_BYTES:
+                yield start, "\n".join(pending), None
+            else:
+                yield start, None, "Malformed row: record too long"
+            pending, size, quotes = [], 0, 0
+
+    if size:
+        yield start, None, "Malformed row: unterminated quoted field"
+
+
+async def _numbered_lines(lines: AsyncIterator[Union[str, _LongLine]]) -> AsyncIterator[tuple]:
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if isinstance(line, _LongLine):
+            yield line_no, None, "Malformed row: line too long"
+        else:
+            yield line_no, line, None
+
+
+async def parse_medicine_rows(lines: AsyncIterator[Union[str, _LongLine]], fmt: str) -> AsyncIterator[tuple]:
+    header = None
+    records = iter_csv_records(lines) if fmt == "csv" else _numbered_lines(lines)
+    async for line_no, line, error in records:
+        if error is not None:
+            yield line_no, None, error
+            continue
+        if not line.strip():
+            continue
+
+        try:
+            if fmt == "csv":
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [name.strip() for name in values]
+                    continue
+                row = dict(zip(header, values))
+            else:
+                row = json.loads(line)
+        except (ValueError, csv.Error) as e:
+            yield line_no, None, f"Malformed row: {e}"
+            continue
+
+        try:
+            medicine = CreateMedicine(**row) if isinstance(row, dict) else None
+        except ValidationError as e:
+            yield line_no, None, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            continue
+
+        if medicine is None:
+            yield line_no, None, "Row must be an object"
+        elif medicine.quantity <= 0:
+            yield line_no, None, "quantity: must be greater than 0"
+        else:
+            yield line_no, medicine, None
+
+
+# Stored expiry values come back from Mongo as naive UTC, so lots are keyed the same way.
+def _lot_key(medicine: CreateMedicine) -> tuple:
+    expiry = medicine.expiry
+    if expiry.tzinfo is not None:
+        expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+    return medicine.medicine_name.strip(), expiry
+
+
+async def import_medicines(chunks: AsyncIterator[bytes], fmt: str, medicine_repo: MedicineRepository, nurse_id: str) -> MedicineImportResult:
+    try:
+        nid = ObjectId(nurse_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid Id Format")
+
+    summary = MedicineImportResult(rows=0, accepted=0, invalid=0, inserted=0, incremented=0)
+    created_at = datetime.utcnow()
+    lots = {}
+
+    committed_through = 0
+
+    # Chunks already written stay written. On a database error the import stops
+    # and the summary says how far it got, so the caller can resume from there
+    # instead of re-sending (and double counting) the whole file.
+    async def flush(line_no: int) -> bool:
+        nonlocal committed_through
+        try:
+            inserted, incremented = await medicine_repo.add_stock(nid, lots, created_at)
+        except PyMongoError as db_err:
+            if isinstance(db_err, BulkWriteError):
+                inserted, incremented = db_err.details.get("nUpserted", 0), db_err.details.get("nMatched", 0)
+            else:
+                inserted, incremented = 0, 0
+            summary.error = (f"Database error: lines up to {committed_through} were imported, the chunk ending "
+                             f"at line {line_no} may be partly applied: {db_err}")
+            logger.error(f"import_medicines: {summary.error}")
+        else:
+            committed_through = line_no
+
+        summary.inserted += inserted
+        summary.incremented += incremented
+        lots.clear()
+        return summary.error is None
+
+    # Rows are merged per (medicine_name, expiry) while they stream in and written
+    # once IMPORT_CHUNK_SIZE distinct lots are pending, so memory stays bounded by
+    # the chunk size rather than the file size.
+    line_no = 0
+    async for line_no, medicine, error in parse_medicine_rows(iter_lines(chunks), fmt):
+        summary.rows += 1
+        if error is not None:
+            summary.invalid += 1
+            if len(summary.errors) < IMPORT_MAX_REPORTED_ERRORS:
+                summary.errors.append(MedicineImportError(line=line_no, detail=error))
+            continue
+
+        key = _lot_key(medicine)
+        lots[key] = lots.get(key, 0) + medicine.quantity
+        summary.accepted += 1
+        if len(lots) >= IMPORT_CHUNK_SIZE and not await flush(line_no):
+            return summary
+
+    if lots and not await flush(line_no):
+        return summary
+
+    logger.info(f"import_medicines: {summary.accepted} rows accepted, {summary.invalid} invalid, "
+                f"{summary.inserted} inserted, {summary.incremented} incremented")
+    return summary
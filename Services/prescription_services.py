@@ -1,100 +1,265 @@
 from fastapi import APIRouter, Depends, Body, HTTPException, status, Request
-from typing import List
-from pymongo.collection import Collection #type: ignore
+from fastapi.responses import JSONResponse
+from typing import List, Optional, Set, Tuple, Union
 from pymongo.errors import PyMongoError
 from bson import ObjectId #type: ignore
 from bson.errors import InvalidId #type: ignore
 from datetime import datetime
 import logging
 
-from DB.schemas import *
-from configurations import get_prescription_collection
+from DB.schemas import (
+    CreatePrescription,
+    CreatePrescriptionBatch,
+    PrescriptionBatchItem,
+    PrescriptionBatchResult,
+    PrescriptionOut,
+    PrescriptionPage,
+    ReadPrescription,
+    UpdatePrescription,
+)
+from Repositories.medicine_repository import MedicineRepository
+from Repositories.prescription_repository import PrescriptionRepository
+from Services.medicine_services import fetch_medicine_details, resolve_medicines
+from pagination import DEFAULT_PAGE_SIZE, seek_filter, split_page
+from projection import projection_for, sparse_page
 
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
+PRESCRIPTION_OUT_PROJECTION = {"patient_id": 1, "patient_name": 1, "description": 1, "expiry": 1, "medicines": 1}
+
+
+# Total quantity per medicine over (medicine_id, quantity) lines; a medicine
+# listed twice counts twice.
+def medicine_demand(lines: List[Tuple[Union[str, ObjectId], int]]) -> dict:
+    demand = {}
+    for medicine_id, quantity in lines:
+        try:
+            med_id = ObjectId(medicine_id)
+        except (InvalidId, TypeError):
+            raise HTTPException(status_code=400, detail=f"Invalid medicine ID: {medicine_id}")
+
+        if quantity is None or quantity <= 0:
+            raise HTTPException(status_code=400, detail=f"Invalid quantity for medicine {medicine_id}")
+
+        demand[med_id] = demand.get(med_id, 0) + quantity
+    return demand
+
+
+# Stock held by lines already stored on a prescription. Older prescriptions may
+# carry lines that were never validated (zero or negative quantities); those are
+# skipped rather than failing an edit the caller did not make to them.
+def stored_demand(lines: list) -> dict:
+    demand = {}
+    for line in lines:
+        quantity = line.get("quantity")
+        if not isinstance(quantity, (int, float)) or quantity <= 0:
+            continue
+        try:
+            med_id = ObjectId(line.get("medicine_id"))
+        except (InvalidId, TypeError):
+            continue
+        demand[med_id] = demand.get(med_id, 0) + quantity
+    return demand
+
+
+async def adjust_medicine_stock(medicine_repo: MedicineRepository, old_meds: list, new_meds: list) -> List[dict]:
+    old_demand = stored_demand(old_meds)
+    new_demand = medicine_demand([(m.get("medicine_id"), m.get("quantity")) for m in new_meds])
+
+    changes = []
+    for med_id in sorted(set(old_demand) | set(new_demand), key=str):
+        # Prescribing more takes stock, prescribing less gives it back.
+        delta_qty = new_demand.get(med_id, 0) - old_demand.get(med_id, 0)
+        if delta_qty != 0:
+            changes.append((med_id, -delta_qty))
 
-def update_medicine_stock(medicine_collect: Collection, medicine_id: ObjectId, delta_qty: int):
     try:
-        result = medicine_collect.update_one(
-            {"_id": medicine_id},
-            {"$inc": {"quantity": -delta_qty}}
-        )
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail=f"Medicine with id {medicine_id} not found")
+        result = await medicine_repo.apply_stock_changes(changes)
     except PyMongoError as db_err:
         raise HTTPException(status_code=500, detail=f"Database error updating stock: {db_err}")
 
+    status_by_index = {i: "applied" for i in result.applied}
+    status_by_index.update({i: "not_found" for i in result.not_found})
+    status_by_index.update({i: "rolled_back" for i in result.rolled_back})
+    if result.insufficient is not None:
+        status_by_index[result.insufficient] = "insufficient_stock"
 
-def adjust_medicine_stock(medicine_collect: Collection, old_meds: list, new_meds: list):
-    old_dict = {str(m["medicine_id"]): m for m in old_meds}
-    new_dict = {str(m["medicine_id"]): m for m in new_meds}
+    outcomes = [
+        {"medicine_id": str(med_id), "stock_delta": delta, "status": status_by_index[i]}
+        for i, (med_id, delta) in enumerate(changes)
+    ]
 
-    all_ids = set(old_dict.keys()) | set(new_dict.keys())
+    if result.ok:
+        logger.debug("adjust_medicine_stock: %s", outcomes)
+        return outcomes
 
-    for med_id_str in all_ids:
-        med_id = ObjectId(med_id_str)
-        old_qty = old_dict.get(med_id_str, {}).get("quantity", 0)
-        new_qty = new_dict.get(med_id_str, {}).get("quantity", 0)
+    status_code = 404 if result.not_found else 409
+    raise HTTPException(status_code=status_code, detail={"message": "Stock could not be adjusted", "items": outcomes})
 
-        delta_qty = new_qty - old_qty
-        if delta_qty != 0:
-            update_medicine_stock(medicine_collect, med_id, delta_qty)
 
 
+async def undo_stock_changes(medicine_repo: MedicineRepository, outcomes: List[dict]):
+    try:
+        await medicine_repo.revert_stock_changes(
+            [(ObjectId(o["medicine_id"]), o["stock_delta"]) for o in outcomes if o["status"] == "applied"]
+        )
+    except PyMongoError as db_err:
+        logger.error(f"undo_stock_changes: failed to revert {outcomes}: {db_err}")
 
-def new_prescription( new_prescription: CreatePrescription, collect: Collection, user_id: str, medicine_collect: Collection) -> PrescriptionOut:
+
+async def reserve_stock(medicine_repo: MedicineRepository, demand: dict):
+    changes = [(med_id, -qty) for med_id, qty in demand.items()]
     try:
-        uid = ObjectId(user_id)
-    except InvalidId:
-        raise HTTPException(status_code=400, detail="Invalid Id format")
+        result = await medicine_repo.apply_stock_changes(changes)
+    except PyMongoError as db_err:
+        raise HTTPException(status_code=500, detail=f"Database error updating stock: {db_err}")
 
-    medicine_list = []
-    for item in new_prescription.medicines:
-        try:
-            med_id = ObjectId(item.medicine_id)  
-        except InvalidId:
-            raise HTTPException(status_code=400, detail=f"Invalid medicine ID: {item.medicine_id}")
-
-        med = medicine_collect.find_one({"_id": med_id})
-        if not med:
-            raise HTTPException(status_code=404, detail=f"Medicine with ID {item.medicine_id} not found")
-
-        available_qty = int(med.get("quantity", 0))
-        if item.quantity > available_qty:
-            raise HTTPException(
-                status_code=409,
-                detail=f"{med.get('medicine_name', 'Unknown')} low stock. Available: {available_qty}"
-            )
+    if result.ok:
+        return
+
+    if result.not_found:
+        med_id = changes[result.not_found[0]][0]
+        raise HTTPException(status_code=404, detail=f"Medicine with ID {med_id} not found")
 
-        medicine_list.append({
-            "medicine_id": str(med["_id"]),
-            "quantity": item.quantity
-        })
+    med_id, delta = changes[result.insufficient]
+    med = await medicine_repo.get(med_id) or {}
+    raise HTTPException(
+        status_code=409,
+        detail=f"{med.get('medicine_name', 'Unknown')} low stock. Available: {int(med.get('quantity', 0))}"
+    )
 
-    data = new_prescription.dict()
+
+async def release_stock(medicine_repo: MedicineRepository, demand: dict):
+    try:
+        await medicine_repo.revert_stock_changes([(med_id, -qty) for med_id, qty in demand.items()])
+    except PyMongoError as db_err:
+        logger.error(f"release_stock: failed to release {demand}: {db_err}")
+
+
+def prescription_demand(prescription: CreatePrescription) -> Tuple[List[dict], dict]:
+    demand = medicine_demand([(item.medicine_id, item.quantity) for item in prescription.medicines])
+    medicine_list = [
+        {"medicine_id": str(ObjectId(item.medicine_id)), "quantity": item.quantity}
+        for item in prescription.medicines
+    ]
+    return medicine_list, demand
+
+
+def prescription_document(prescription: CreatePrescription, medicine_list: List[dict], doctor_id: ObjectId) -> dict:
+    data = prescription.dict()
     data.update({
         "medicines": medicine_list,
         "completed": False,
         "created_at": datetime.utcnow(),
-        "doctor_id": uid,
+        "doctor_id": doctor_id,
     })
+    return data
+
+
+async def new_prescription( new_prescription: CreatePrescription, prescription_repo: PrescriptionRepository, user_id: str, medicine_repo: MedicineRepository) -> PrescriptionOut:
+    try:
+        uid = ObjectId(user_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid Id format")
+
+    medicine_list, demand = prescription_demand(new_prescription)
+
+    # One conditional decrement per medicine in a single bulk write; nothing is
+    # decremented unless every medicine has enough stock.
+    await reserve_stock(medicine_repo, demand)
+
+    data = prescription_document(new_prescription, medicine_list, uid)
 
     try:
-        result = collect.insert_one(data)
+        await prescription_repo.create(data)
+    except PyMongoError as db_err:
+        await release_stock(medicine_repo, demand)
+        raise HTTPException(status_code=500, detail=f"Database error: {db_err}")
+
+    return PrescriptionOut(**data)
 
-        for m in medicine_list:
-            update_medicine_stock(medicine_collect, ObjectId(m["medicine_id"]), m["quantity"])
 
-        doc = collect.find_one({"_id": result.inserted_id})
+async def new_prescriptions(batch: CreatePrescriptionBatch, prescription_repo: PrescriptionRepository, user_id: str, medicine_repo: MedicineRepository) -> PrescriptionBatchResult:
+    try:
+        uid = ObjectId(user_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid Id format")
+
+    results = {}
+    pending = []
+    for index, prescription in enumerate(batch.prescriptions):
+        try:
+            medicine_list, demand = prescription_demand(prescription)
+        except HTTPException as e:
+            results[index] = PrescriptionBatchItem(index=index, status="invalid", detail=e.detail)
+            continue
+        pending.append((index, prescription, medicine_list, demand))
+
+    # Items are checked in order against one stock snapshot so each can be accepted
+    # or refused on its own; the accepted total is then reserved in a single bulk
+    # write, which still guards against stock that moved since the snapshot.
+    med_ids = {med_id for *_, demand in pending for med_id in demand}
+    try:
+        stock = {doc["_id"]: doc for doc in await medicine_repo.get_many(med_ids, {"medicine_name": 1, "quantity": 1})}
     except PyMongoError as db_err:
         raise HTTPException(status_code=500, detail=f"Database error: {db_err}")
 
-    if not doc:
-        raise HTTPException(status_code=500, detail="Failed to create prescription")
+    accepted = []
+    total = {}
+    for index, prescription, medicine_list, demand in pending:
+        missing = next((med_id for med_id in demand if med_id not in stock), None)
+        if missing is not None:
+            results[index] = PrescriptionBatchItem(index=index, status="not_found", detail=f"Medicine with ID {missing} not found")
+            continue
 
-    return PrescriptionOut(**doc)
+        short = next((med_id for med_id, qty in demand.items() if stock[med_id].get("quantity", 0) - total.get(med_id, 0) < qty), None)
+        if short is not None:
+            med = stock[short]
+            available = int(med.get("quantity", 0) - total.get(short, 0))
+            results[index] = PrescriptionBatchItem(
+                index=index,
+                status="insufficient_stock",
+                detail=f"{med.get('medicine_name', 'Unknown')} low stock. Available: {available}"
+            )
+            continue
+
+        for med_id, qty in demand.items():
+            total[med_id] = total.get(med_id, 0) + qty
+        accepted.append((index, prescription, medicine_list, demand))
+
+    if accepted:
+        try:
+            await reserve_stock(medicine_repo, total)
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+            for index, *_ in accepted:
+                results[index] = PrescriptionBatchItem(index=index, status="conflict", detail=f"Stock changed during the batch, retry: {e.detail}")
+            accepted = []
+
+    docs = [prescription_document(prescription, medicine_list, uid) for _, prescription, medicine_list, _ in accepted]
+    try:
+        failed = set(await prescription_repo.create_many(docs))
+    except PyMongoError as db_err:
+        await release_stock(medicine_repo, total)
+        raise HTTPException(status_code=500, detail=f"Database error: {db_err}")
+
+    unused = {}
+    for position, (index, _, _, demand) in enumerate(accepted):
+        if position in failed:
+            for med_id, qty in demand.items():
+                unused[med_id] = unused.get(med_id, 0) + qty
+            results[index] = PrescriptionBatchItem(index=index, status="failed", detail="Prescription could not be saved")
+        else:
+            results[index] = PrescriptionBatchItem(index=index, status="created", prescription_id=str(docs[position]["_id"]))
+    if unused:
+        await release_stock(medicine_repo, unused)
+
+    items = [results[index] for index in range(len(batch.prescriptions))]
+    created = sum(1 for item in items if item.status == "created")
+    logger.info(f"new_prescriptions: created {created} of {len(items)}")
+    return PrescriptionBatchResult(created=created, failed=len(items) - created, results=items)
 
 
 
@@ -121,7 +286,7 @@ def new_prescription( new_prescription: CreatePrescription, collect: Collection,
 
 #     return ReadPrescription(**doc)
 
-def fetch_prescription_by_id(id: str, collect: Collection, medicine_collect: Collection, user_id: str) -> ReadPrescription:
+async def fetch_prescription_by_id(id: str, prescription_repo: PrescriptionRepository, medicine_repo: MedicineRepository, user_id: str) -> ReadPrescription:
     try:
         uid = ObjectId(user_id)
         object_id = ObjectId(id)
@@ -129,7 +294,7 @@ def fetch_prescription_by_id(id: str, collect: Collection, medicine_collect: Col
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
     try:
-        doc = collect.find_one({"_id": object_id, "doctor_id": uid})
+        doc = await prescription_repo.get_for_doctor(object_id, uid)
     except PyMongoError as db_err:
         raise HTTPException(status_code=500, detail=f"Database error occurred: {db_err}")
     except Exception as e:
@@ -138,24 +303,9 @@ def fetch_prescription_by_id(id: str, collect: Collection, medicine_collect: Col
     if not doc:
         raise HTTPException(status_code=404, detail="Prescription not found")
 
-    medicines_with_details = []
-    for med in doc.get("medicines", []):
-        try:
-            med_id = ObjectId(med.get("medicine_id"))
-            medicine_doc = medicine_collect.find_one({"_id": med_id})
-            
-            if medicine_doc:
-                medicines_with_details.append({
-                    "medicine_name": medicine_doc.get("medicine_name"),
-                    "quantity": med.get("quantity"),
-                    "expiry": medicine_doc.get("expiry"),
-                    "created_at": medicine_doc.get("created_at")
-                })
-            else:
-                logger.warning(f"Medicine with ID {med_id} not found")
-        except (InvalidId, KeyError, TypeError) as e:
-            logger.warning(f"Error processing medicine: {e}")
-            continue
+    medicine_lines = doc.get("medicines") or []
+    details = await fetch_medicine_details(medicine_repo, medicine_lines)
+    medicines_with_details = resolve_medicines(medicine_lines, details)
 
     prescription_data = {
         "prescription_id": str(doc["_id"]),
@@ -173,65 +323,79 @@ def fetch_prescription_by_id(id: str, collect: Collection, medicine_collect: Col
 
 
 
-def fetch_prescription(collect: Collection, user_id: str) -> List[ReadPrescription]:
+READ_PRESCRIPTION_SOURCES = {"prescription_id": ("_id",), "user_id": ("doctor_id",)}
+READ_PRESCRIPTION_PROJECTION = projection_for(ReadPrescription, READ_PRESCRIPTION_SOURCES)
+
+
+async def fetch_prescription(prescription_repo: PrescriptionRepository, user_id: str, cursor: Optional[str] = None,
+                             limit: int = DEFAULT_PAGE_SIZE, fields: Optional[Set[str]] = None) -> Union[PrescriptionPage, JSONResponse]:
     try:
         uid = ObjectId(user_id)
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
+    projection = projection_for(ReadPrescription, READ_PRESCRIPTION_SOURCES, fields) if fields else READ_PRESCRIPTION_PROJECTION
     try:
-        cursor = collect.find({"doctor_id": uid})
+        docs = await prescription_repo.list_for_doctor(uid, seek_filter(cursor), limit + 1, projection)
     except PyMongoError as db_err:
         raise HTTPException(status_code=500, detail=f"Database error occurred: {db_err}")
 
+    docs, next_cursor = split_page(docs, limit)
     prescriptions = []
 
-    for doc in cursor:
+    for doc in docs:
         doc["prescription_id"] = str(doc["_id"])
-        doc["user_id"] = str(doc["doctor_id"])
+        doc["user_id"] = str(doc.get("doctor_id", ""))
         doc["medicines"] = doc.get("medicines") or []
 
+        if fields:
+            prescriptions.append(doc)
+            continue
         try:
             prescriptions.append(ReadPrescription(**doc))
         except Exception as e:
             continue
 
-    if not prescriptions:
+    if not prescriptions and not cursor:
         raise HTTPException(status_code=404, detail="Prescriptions not found")
 
-    return prescriptions
+    if fields:
+        return sparse_page(prescriptions, next_cursor, fields)
+    return PrescriptionPage(items=prescriptions, next_cursor=next_cursor)
 
 
 
 
-def alter_prescription(id: str, alter_data: UpdatePrescription, collect: Collection, user_id: str, medicine_collect: Collection) -> PrescriptionOut:
+async def alter_prescription(id: str, alter_data: UpdatePrescription, prescription_repo: PrescriptionRepository, user_id: str, medicine_repo: MedicineRepository) -> PrescriptionOut:
     try:
         object_id = ObjectId(id)
         uid = ObjectId(user_id)
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid Id format")
 
-    existing_prescription = collect.find_one({"_id": object_id, "doctor_id": uid})
+    existing_prescription = await prescription_repo.get_for_doctor(object_id, uid)
     if not existing_prescription:
         raise HTTPException(status_code=404, detail="Prescription not found or not authorized")
 
     update_dict = {k: v for k, v in alter_data.dict(exclude_unset=True).items()}
 
+    stock_changes = []
     if "medicines" in update_dict:
         new_meds = update_dict["medicines"]
         old_meds = existing_prescription.get("medicines", [])
-        adjust_medicine_stock(medicine_collect, old_meds, new_meds)
+        stock_changes = await adjust_medicine_stock(medicine_repo, old_meds, new_meds)
 
     if not update_dict:
         raise HTTPException(status_code=400, detail="No data provided for update")
 
     try:
-        collect.update_one({"_id": object_id, "doctor_id": uid}, {"$set": update_dict})
-        doc = collect.find_one({"_id": object_id, "doctor_id": uid})
+        doc = await prescription_repo.update_for_doctor(object_id, uid, update_dict, PRESCRIPTION_OUT_PROJECTION)
     except PyMongoError as db_err:
+        await undo_stock_changes(medicine_repo, stock_changes)
         raise HTTPException(status_code=500, detail=f"Database error occurred: {db_err}")
 
     if not doc:
+        await undo_stock_changes(medicine_repo, stock_changes)
         raise HTTPException(status_code=404, detail="Prescription not found after update")
 
     return PrescriptionOut(**doc)
@@ -239,7 +403,7 @@ def alter_prescription(id: str, alter_data: UpdatePrescription, collect: Collect
 
     
 
-def remove_prescription(id: str, collect: Collection, user_id: str) -> dict:
+async def remove_prescription(id: str, prescription_repo: PrescriptionRepository, user_id: str) -> dict:
     try:
         object_id = ObjectId(id)
         uid = ObjectId(user_id)
@@ -248,7 +412,7 @@ def remove_prescription(id: str, collect: Collection, user_id: str) -> dict:
         raise HTTPException(status_code=400,  detail="Invalid Id Format")
 
     try:
-        doc = collect.delete_one({"_id": object_id, "doctor_id": uid})
+        doc = await prescription_repo.delete_for_doctor(object_id, uid)
 
     except PyMongoError as db_err:
         logger.exception(f"Database error during Prescription update: {db_err}")
@@ -1,28 +1,53 @@
 from fastapi import APIRouter, Depends, Body, HTTPException, status, Request
-from typing import List
-from pymongo.collection import Collection #type: ignore
-from pymongo.errors import PyMongoError
+from fastapi.responses import JSONResponse
+from typing import List, Optional, Set, Tuple, Union
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from bson import ObjectId #type: ignore
 from bson.errors import InvalidId #type: ignore
 from datetime import datetime
+import csv
+import io
+import json
 import logging
-
-from authentication import *
-from DB.schemas import *
-from Services.user_services import *
-from configurations import get_user_collection
+import time
+
+from pydantic import ValidationError
+
+from authentication import hash_pwd_async, password_hasher, verify_password_async
+from DB.models import Role
+from DB.schemas import (
+    MAX_STAFF_BATCH,
+    PasswordUpdate,
+    PrescriptionPage,
+    ReadPrescription,
+    StaffOnboard,
+    StaffOnboardItem,
+    StaffOnboardResult,
+    UserCreate,
+    UserOut,
+    UserPage,
+)
+from Services.user_services import get_user_by_email
+from Services.medicine_services import fetch_medicine_details, resolve_medicines
+from Repositories.medicine_repository import MedicineRepository
+from Repositories.prescription_repository import PrescriptionRepository
+from Repositories.user_repository import UserRepository
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor, seek_filter, split_page
+from projection import projection_for, sparse_page
+from instrumentation import current_query_count
+from middleware import invalidate_user_tokens
 
 logger = logging.getLogger(__name__)
 
-def insert_doctor(doctor_user: UserCreate ,users_collection: Collection) -> UserOut:
-    existing_user = get_user_by_email(doctor_user.email)
+async def insert_doctor(doctor_user: UserCreate, user_repo: UserRepository) -> UserOut:
+    existing_user = await get_user_by_email(doctor_user.email, user_repo)
     if existing_user:
         logger.exception(f"register: email already exists")
         raise HTTPException(status_code=409, detail="email already exists")
     
     try:
-        logger.info(f"create doctor: hashing the password...")
-        hashed_pwd = hash_pwd(doctor_user.password)
+        logger.debug("create doctor: hashing the password...")
+        hashed_pwd = await hash_pwd_async(doctor_user.password)
 
     except ValueError as val_err:   
         logger.exception(f"register: Password hashing failed: {val_err}")
@@ -33,41 +58,43 @@ def insert_doctor(doctor_user: UserCreate ,users_collection: Collection) -> User
         "password": hashed_pwd,
         "email": doctor_user.email,
         "role": Role.doctor.value,
-        "is_active": True
+        "is_active": True,
+        "created_at": datetime.utcnow()
     }
 
 
     try:
-        logger.info(f" Creating doctor...")
-        result = users_collection.insert_one(new_doctor_doc)
-        created_user = users_collection.find_one({"_id": result.inserted_id})
+        logger.debug(" Creating doctor...")
+        await user_repo.create(new_doctor_doc)
 
+    except DuplicateKeyError:
+        logger.warning(f"create doctor: email already exists")
+        raise HTTPException(status_code=409, detail="email already exists")
     except Exception as db_err:
         logger.exception(f"Failed to create doctor: {db_err}")
         raise HTTPException(status_code=500, detail="Failed to create doctor")
 
-    if created_user:
-            logging.info("User Created Successfully...")
+    logger.info("User Created Successfully...")
 
-            return UserOut(
-                username=created_user['username'],
-                email=created_user['email'],
-                is_active=created_user['is_active'],
-                role=Role.doctor
-            )
+    return UserOut(
+        username=new_doctor_doc['username'],
+        email=new_doctor_doc['email'],
+        is_active=new_doctor_doc['is_active'],
+        role=Role.doctor
+    )
             
     
 
 
-def insert_nurse(nurse_user: UserCreate ,users_collection: Collection) -> UserOut:
-    existing_user = get_user_by_email(nurse_user.email)
+async def insert_nurse(nurse_user: UserCreate, user_repo: UserRepository) -> UserOut:
+    existing_user = await get_user_by_email(nurse_user.email, user_repo)
     if existing_user:
         logger.exception(f"register: email already exists")
         raise HTTPException(status_code=409, detail="email already exists")
 
     try:
-        logger.info(f"create nurse: hashing the password...")
-        hashed_pwd = hash_pwd(nurse_user.password)
+        logger.debug("create nurse: hashing the password...")
+        hashed_pwd = await hash_pwd_async(nurse_user.password)
 
     except ValueError as val_err:   
         logger.exception(f"register: Password hashing failed: {val_err}")
@@ -78,71 +105,169 @@ def insert_nurse(nurse_user: UserCreate ,users_collection: Collection) -> UserOu
         "password": hashed_pwd,
         "email": nurse_user.email,
         "role": Role.nurse.value,
-        "is_active": True
+        "is_active": True,
+        "created_at": datetime.utcnow()
     }
 
     try:
-        logger.info(f" Creating nurse...")
-        result = users_collection.insert_one(new_nurse_doc)
-        created_user = users_collection.find_one({"_id": result.inserted_id})
+        logger.debug(" Creating nurse...")
+        await user_repo.create(new_nurse_doc)
 
+    except DuplicateKeyError:
+        logger.warning(f"create nurse: email already exists")
+        raise HTTPException(status_code=409, detail="email already exists")
     except Exception as db_err:
         logger.exception(f"Failed to create nurse: {db_err}")
         raise HTTPException(status_code=500, detail="Failed to create nurse")
 
-    if created_user:
-            logging.info("User Created Successfully...")
+    logger.info("User Created Successfully...")
 
-            return UserOut(
-                username=created_user['username'],
-                email=created_user['email'],
-                is_active=created_user['is_active'],
-                role=Role.nurse
-            )
+    return UserOut(
+        username=new_nurse_doc['username'],
+        email=new_nurse_doc['email'],
+        is_active=new_nurse_doc['is_active'],
+        role=Role.nurse
+    )
             
 
 
-def fetch_prescription(id: str, collect: Collection, medicine_collect: Collection):
+def parse_staff_rows(body: bytes, fmt: str) -> List[dict]:
+    try:
+        text = body.decode("utf-8-sig")
+        if fmt == "csv":
+            rows = [{key.strip(): value for key, value in row.items() if key} for row in csv.DictReader(io.StringIO(text))]
+        else:
+            rows = json.loads(text)
+            if isinstance(rows, dict):
+                rows = rows.get("staff")
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse staff list: {e}")
+
+    if not isinstance(rows, list) or not rows:
+        raise HTTPException(status_code=400, detail="Staff list must be a non-empty list")
+    if len(rows) > MAX_STAFF_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_STAFF_BATCH} staff per request")
+    return rows
+
+
+async def onboard_staff(rows: List[dict], user_repo: UserRepository) -> StaffOnboardResult:
+    results = {}
+    pending = []
+    seen = set()
+    for index, row in enumerate(rows):
+        try:
+            staff = StaffOnboard(**row) if isinstance(row, dict) else None
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            # The raw email may not be a string (e.g. 123 in JSON); echo it back as text.
+            email = row.get("email")
+            results[index] = StaffOnboardItem(index=index, status="invalid", email=None if email is None else str(email), detail=detail)
+            continue
+
+        if staff is None:
+            results[index] = StaffOnboardItem(index=index, status="invalid", detail="Row must be an object")
+        elif staff.role not in (Role.doctor, Role.nurse):
+            results[index] = StaffOnboardItem(index=index, status="invalid", email=staff.email, detail="role must be doctor or nurse")
+        elif staff.email in seen:
+            results[index] = StaffOnboardItem(index=index, status="duplicate", email=staff.email, detail="email repeated in this batch")
+        else:
+            seen.add(staff.email)
+            pending.append((index, staff))
+
+    try:
+        existing = await user_repo.existing_emails(seen) if seen else set()
+    except PyMongoError as db_err:
+        logger.exception(f"onboard_staff: email lookup failed: {db_err}")
+        raise HTTPException(status_code=500, detail="Failed to onboard staff")
+
+    accepted = []
+    for index, staff in pending:
+        if staff.email in existing:
+            results[index] = StaffOnboardItem(index=index, status="exists", email=staff.email, detail="email already exists")
+        else:
+            accepted.append((index, staff))
+
+    logger.debug("onboard_staff: hashing %s passwords...", len(accepted))
+    hashes = await password_hasher.hash_many([staff.password for _, staff in accepted])
+
+    docs = []
+    hashed = []
+    for (index, staff), hashed_pwd in zip(accepted, hashes):
+        if isinstance(hashed_pwd, BaseException):
+            logger.error(f"onboard_staff: password hashing failed for row {index}: {hashed_pwd}")
+            detail = hashed_pwd.detail if isinstance(hashed_pwd, HTTPException) else "Password hashing failed"
+            results[index] = StaffOnboardItem(index=index, status="failed", email=staff.email, detail=detail)
+            continue
+
+        docs.append({
+            "username": staff.username,
+            "password": hashed_pwd,
+            "email": staff.email,
+            "role": staff.role.value,
+            "is_active": staff.is_active,
+            "created_at": datetime.utcnow()
+        })
+        hashed.append((index, staff))
+
+    try:
+        errors = await user_repo.create_many(docs)
+    except PyMongoError as db_err:
+        logger.exception(f"onboard_staff: insert failed: {db_err}")
+        raise HTTPException(status_code=500, detail="Failed to onboard staff")
+
+    for position, (index, staff) in enumerate(hashed):
+        code = errors.get(position)
+        if code is None:
+            results[index] = StaffOnboardItem(index=index, status="created", email=staff.email)
+        elif code == 11000:
+            results[index] = StaffOnboardItem(index=index, status="exists", email=staff.email, detail="email already exists")
+        else:
+            results[index] = StaffOnboardItem(index=index, status="failed", email=staff.email, detail="Failed to create user")
+
+    items = [results[index] for index in range(len(rows))]
+    created = sum(1 for item in items if item.status == "created")
+    logger.info(f"onboard_staff: created {created} of {len(items)}")
+    return StaffOnboardResult(created=created, failed=len(items) - created, results=items)
+
+
+
+# ReadPrescription fields that are not stored under their own name.
+STAFF_PRESCRIPTION_SOURCES = {"prescription_id": ("_id",), "user_id": ("patient_id",)}
+STAFF_PRESCRIPTION_PROJECTION = projection_for(ReadPrescription, STAFF_PRESCRIPTION_SOURCES)
+
+
+async def fetch_prescription(id: str, prescription_repo: PrescriptionRepository, medicine_repo: MedicineRepository,
+                             cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                             fields: Optional[Set[str]] = None) -> Union[PrescriptionPage, JSONResponse]:
     try:
         doctor_id = ObjectId(id)
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid doctor ID format")
     
-    logger.info(f"Searching for doctor_id: {doctor_id}")
-        
+    logger.debug("Searching for doctor_id: %s", doctor_id)
+
+    projection = projection_for(ReadPrescription, STAFF_PRESCRIPTION_SOURCES, fields) if fields else STAFF_PRESCRIPTION_PROJECTION
     try:
-        docs = list(collect.find({"doctor_id": doctor_id}))
+        docs = await prescription_repo.list_for_doctor(doctor_id, seek_filter(cursor), limit + 1, projection)
         
-        logger.info(f"Found {len(docs)} prescriptions")
+        logger.debug("Found %s prescriptions", len(docs))
     except PyMongoError as db_err:
         raise HTTPException(status_code=500, detail=f"Database error occurred: {str(db_err)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error occurred: {str(e)}")
     
-    if not docs:
+    if not docs and not cursor:
         raise HTTPException(status_code=404, detail="No prescriptions found for this doctor")
     
+    docs, next_cursor = split_page(docs, limit)
+    all_medicine_lines = [med for doc in docs for med in (doc.get("medicines") or [])]
+    details = await fetch_medicine_details(medicine_repo, all_medicine_lines)
+    logger.debug("fetch_prescription: %s prescriptions resolved with %s queries", len(docs), current_query_count())
+
     prescription_list = []
     for doc in docs:
-        medicines_with_details = []
-        for med in doc.get("medicines", []):
-            try:
-                med_id = ObjectId(med.get("medicine_id"))
-                medicine_doc = medicine_collect.find_one({"_id": med_id})
-                
-                if medicine_doc:
-                    medicines_with_details.append({
-                        "medicine_name": medicine_doc.get("medicine_name"),
-                        "quantity": med.get("quantity"),
-                        "expiry": medicine_doc.get("expiry"),
-                        "created_at": medicine_doc.get("created_at")
-                    })
-                else:
-                    logger.warning(f"Medicine with ID {med_id} not found")
-            except (InvalidId, KeyError, TypeError) as e:
-                logger.warning(f"Error processing medicine: {e}")
-                continue
-        
+        medicines_with_details = resolve_medicines(doc.get("medicines") or [], details)
+
         prescription_data = {
             "prescription_id": str(doc["_id"]),
             "user_id": str(doc.get("patient_id", "")),  
@@ -154,198 +279,183 @@ def fetch_prescription(id: str, collect: Collection, medicine_collect: Collectio
             "created_at": doc.get("created_at")
         }
         
-        prescription_list.append(ReadPrescription(**prescription_data))
-    
-    return prescription_list
+        prescription_list.append(prescription_data)
+
+    if fields:
+        return sparse_page(prescription_list, next_cursor, fields)
+    return PrescriptionPage(items=[ReadPrescription(**data) for data in prescription_list], next_cursor=next_cursor)
 
 
 
-def aggr_fetch_prescription(id: str, collect: Collection, medicine_collect: Collection):
+async def aggr_fetch_prescription(id: str, prescription_repo: PrescriptionRepository, medicine_repo: MedicineRepository,
+                                  cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> PrescriptionPage:
     try:
         doctor_id = ObjectId(id)
-    except InvalidId:
+    except InvalidId as e:
         logger.error(f"Invalid doctor ID received: {id}, error: {e}")
         raise HTTPException(status_code=400, detail="Invalid doctor ID format")
-    
-    logger.info(f"Searching for doctor_id: {doctor_id}")
-        
-    
-    logger.info(f"Executing aggregation pipeline for doctor_id: {doctor_id}")
-
-    pipeline = [
-    {"$match": {"doctor_id": doctor_id}},
-    {"$unwind": "$medicines"},
-    {"$lookup": {
-        "from": medicine_collect.name,
-        "localField": "medicines.medicine_id",
-        "foreignField": "medicine_id",
-        "as": "medicine_details"
-    }},
-    {"$unwind": "$medicine_details"},
-    {"$group": {
-        "_id": "$_id",
-        "doctor_id": {"$first": "$doctor_id"},
-        "patient_id": {"$first": "$patient_id"},
-        "patient_name": {"$first": "$patient_name"},
-        "description": {"$first": "$description"},
-        "completed": {"$first": "$completed"},
-        "expiry": {"$first": "$expiry"},
-        "created_at": {"$first": "$created_at"},
-        "medicines": {"$push": {
-            "medicine_id": "$medicine_details.medicine_id",
-            "medicine_name": "$medicine_details.medicine_name",
-            "quantity": "$medicines.quantity",
-            "expiry": "$medicine_details.expiry",
-            "created_at": "$medicine_details.created_at"
-        }}
-    }},
-    {"$sort": { "created_at": -1 } } 
-]
-
-    logger.info(f"Aggregation returned {len(pipeline)} prescriptions")
 
+    logger.debug("Executing aggregation pipeline for doctor_id: %s", doctor_id)
 
+    prescription_list = []
+    last_doc = None
+    has_more = False
     try:
-        docs = list(collect.aggregate(pipeline))
-    except Exception as e:
+        docs = await prescription_repo.aggregate_for_doctor(doctor_id, seek_filter(cursor), limit + 1, medicine_repo.name)
+        # Breaking out early leaves the server cursor open, so it is closed here.
+        try:
+            async for doc in docs:
+                if len(prescription_list) == limit:
+                    has_more = True
+                    break
+                last_doc = doc
+                prescription_list.append(ReadPrescription(
+                    prescription_id=str(doc["_id"]),
+                    user_id=str(doc.get("patient_id", "")),
+                    patient_name=doc.get("patient_name", ""),
+                    description=doc.get("description", ""),
+                    completed=doc.get("completed", False),
+                    medicines=doc.get("medicines", []),
+                    expiry=doc.get("expiry"),
+                    created_at=doc.get("created_at")
+                ))
+        finally:
+            await docs.close()
+    except PyMongoError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    
-    if not docs:
+
+    if not prescription_list and not cursor:
         raise HTTPException(status_code=404, detail="No prescriptions found")
-    
-    
-    prescription_list = [ReadPrescription(
-        prescription_id=str(doc["_id"]),
-        user_id=str(doc.get("patient_id", "")),
-        patient_name=doc.get("patient_name", ""),
-        description=doc.get("description", ""),
-        completed=doc.get("completed", False),
-        medicines=doc.get("medicines", []),
-        expiry=doc.get("expiry"),
-        created_at=doc.get("created_at")
-    ) for doc in docs]
-    
-    return prescription_list
+
+    logger.debug("Aggregation returned %s prescriptions", len(prescription_list))
+
+    next_cursor = encode_cursor(last_doc.get("created_at"), last_doc["_id"]) if has_more else None
+    return PrescriptionPage(items=prescription_list, next_cursor=next_cursor)
 
 
 
-def fetch_doctors(collect: Collection) -> List[UserOut]:
+USER_OUT_PROJECTION = projection_for(UserOut)
+
+
+async def _list_staff(role: Role, user_repo: UserRepository, cursor: Optional[str], limit: int,
+                      fields: Optional[Set[str]]) -> Tuple[List[dict], Optional[str]]:
     try:
-        fetch = collect.find({"role": "doctor"})
+        fetch = await user_repo.list_by_role(role.value, seek_filter(cursor), limit + 1,
+                                             projection_for(UserOut, fields=fields) if fields else USER_OUT_PROJECTION)
         
-    except Exception as db_err:
+    except PyMongoError as db_err:
         logger.error(f"Database error: {db_err}")
         raise HTTPException(status_code=500, detail="Database error occurred")
 
-    if not fetch:
-        raise HTTPException(status_code=404, detail="No doctors in the database")
+    if not fetch and not cursor:
+        raise HTTPException(status_code=404, detail=f"No {role.value}s in the database")
 
-    return [
-        UserOut(
-        username = f.get("username", ""),
-        email = f.get("email", ""),
-        is_active = f.get("is_active", False),
-        role = f.get("role", ""),
-        )
+    fetch, next_cursor = split_page(fetch, limit)
+    items = [
+        {
+            "username": f.get("username", ""),
+            "email": f.get("email", ""),
+            "is_active": f.get("is_active", False),
+            "role": f.get("role", ""),
+        }
         for f in fetch
     ]
+    return items, next_cursor
 
 
-def fetch_nurses(collect: Collection) -> List[UserOut]:
-    try:
-        fetch = collect.find({"role": "nurse"})
-    
-    except Exception as db_err:
-        logger.error(f"Database error: {db_err}")
-        raise HTTPException(status_code=500, detail="Database Error Occured")
-    
-    if not fetch:
-        raise HTTPException(status_code=404, detail="No nurses in the databse")
-    
-    return [
-        UserOut(
-        username = f.get("username", ""),
-        email = f.get("email", ""),
-        is_active = f.get("is_active", False),
-        role = f.get("role", ""),
-        )
-        for f in fetch
-    ]
+async def fetch_doctors(user_repo: UserRepository, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                        fields: Optional[Set[str]] = None) -> Union[UserPage, JSONResponse]:
+    items, next_cursor = await _list_staff(Role.doctor, user_repo, cursor, limit, fields)
+    if fields:
+        return sparse_page(items, next_cursor, fields)
+    return UserPage(items=[UserOut(**item) for item in items], next_cursor=next_cursor)
+
+
+async def fetch_nurses(user_repo: UserRepository, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                       fields: Optional[Set[str]] = None) -> Union[UserPage, JSONResponse]:
+    items, next_cursor = await _list_staff(Role.nurse, user_repo, cursor, limit, fields)
+    if fields:
+        return sparse_page(items, next_cursor, fields)
+    return UserPage(items=[UserOut(**item) for item in items], next_cursor=next_cursor)
     
 
 
 
-def update_doctor_password(collect: Collection, password_data: PasswordUpdate, doctor_id: str) -> dict:
+async def update_doctor_password(user_repo: UserRepository, password_data: PasswordUpdate, doctor_id: str) -> dict:
     try:
-        doctor = user_collection.find_one({"_id": ObjectId(doctor_id)})
+        doctor = await user_repo.get(ObjectId(doctor_id))
         if not doctor:
             raise HTTPException(status_code=404, detail="User not found")
 
-        if not verify_password(password_data.old_password, doctor["password"]):
+        if not await verify_password_async(password_data.old_password, doctor["password"]):
             raise HTTPException(status_code=401, detail="Incorrect username or password")
         
         if not password_data.new_password or len(password_data.new_password.strip()) == 0:
             raise HTTPException(status_code=400, detail="Password cannot be empty")
         
-        logger.info(f"Updating password for doctor_id={doctor_id}")
+        logger.debug("Updating password for doctor_id=%s", doctor_id)
         try:
             object_id = ObjectId(doctor_id)
         except Exception as e:
             logger.error(f"Invalid doctor ID format: {e}")
             raise HTTPException(status_code=400, detail=f"Invalid doctor ID format: {e}")
         
-        hashed_password = hash_pwd(password_data.new_password)
+        hashed_password = await hash_pwd_async(password_data.new_password)
         
-        result = collect.update_one(
-            {"_id": object_id},
-            {"$set": {"password": hashed_password}}
-        )
+        valid_after = time.time()
+        result = await user_repo.set_password(object_id, hashed_password, valid_after)
         
         if result.matched_count == 0:
             logger.warning(f"Doctor not found for ID: {doctor_id}")
             raise HTTPException(status_code=404, detail="Doctor not found")
+
+        invalidate_user_tokens(doctor_id, valid_after)
         
-        logger.info("Password updated successfully")
+        logger.debug("Password updated successfully")
         return {"message": "Password updated successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to update password ...")
         raise HTTPException(status_code=500, detail=f"Failed to update password due to server error {e}")
 
 
-def update_nurse_password(collect: Collection, password_data: PasswordUpdate, nurse_id: str) -> dict:
+async def update_nurse_password(user_repo: UserRepository, password_data: PasswordUpdate, nurse_id: str) -> dict:
     try:
-        nurse = user_collection.find_one({"_id": ObjectId(nurse_id)})
+        nurse = await user_repo.get(ObjectId(nurse_id))
         if not nurse:
             raise HTTPException(status_code=404, detail="User not found")
 
-        if not verify_password(password_data.old_password, nurse["password"]):
+        if not await verify_password_async(password_data.old_password, nurse["password"]):
             raise HTTPException(status_code=401, detail="Incorrect username or password")
         
         if not password_data.new_password or len(password_data.new_password.strip()) == 0:
             raise HTTPException(status_code=400, detail="Password cannot be empty")
         
-        logger.info(f"Updating password for nurse_id={nurse_id}")
+        logger.debug("Updating password for nurse_id=%s", nurse_id)
         try:
             object_id = ObjectId(nurse_id)
         except Exception as e:
             logger.error(f"Invalid nurse ID format: {e}")
             raise HTTPException(status_code=400, detail=f"Invalid nurse ID format: {e}")
         
-        hashed_password = hash_pwd(password_data.new_password)
+        hashed_password = await hash_pwd_async(password_data.new_password)
         
-        result = collect.update_one(
-            {"_id": object_id},
-            {"$set": {"password": hashed_password}}
-        )
+        valid_after = time.time()
+        result = await user_repo.set_password(object_id, hashed_password, valid_after)
         
         if result.matched_count == 0:
             logger.warning(f"nurse not found for ID: {nurse_id}")
             raise HTTPException(status_code=404, detail="nurse Id not found")
+
+        invalidate_user_tokens(nurse_id, valid_after)
         
-        logger.info("Password updated successfully")
+        logger.debug("Password updated successfully")
         return {"message": "Password updated successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to update password ...")
         raise HTTPException(status_code=500, detail="Failed to update password due to server error")
\ No newline at end of file
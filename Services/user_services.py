@@ -1,27 +1,32 @@
 from DB.models import Users
-from configurations import user_collection
+from Repositories.user_repository import UserRepository
 import logging
-from pymongo.errors import PyMongoError 
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from fastapi import HTTPException
+from datetime import datetime
 
 
 logger = logging.getLogger(__name__)
 
-def create_user(user: Users):
+async def create_user(user: Users, user_repo: UserRepository):
     try:
-        logger.info(f"create_user: User is getting created.. ")
+        logger.debug("create_user: User is getting created.. ")
         user_dict = user.model_dump()
-        result = user_collection.insert_one(user_dict)
-        user_dict['user_id'] = str(result.inserted_id)
+        user_dict['created_at'] = datetime.utcnow()
+        inserted_id = await user_repo.create(user_dict)
+        user_dict['user_id'] = str(inserted_id)
         return user_dict
+    except DuplicateKeyError:
+        logger.warning(f"create_user: email already exists")
+        raise HTTPException(status_code=409, detail="email already exists")
     except PyMongoError as db_err:
         logger.error(f"create_user: Database error while creating user: {db_err}")
         raise HTTPException(status_code=500, detail="Database insert failed")
 
-def get_user_by_email(email: str):
+async def get_user_by_email(email: str, user_repo: UserRepository):
     try:
-        logger.info(f"get_user_by_email: fetching user... ")
-        user = user_collection.find_one({"email": email})
+        logger.debug("get_user_by_email: fetching user... ")
+        user = await user_repo.get_by_email(email)
         return user
     except PyMongoError as db_err:
         logger.error(f"get_user_by_email: Database error while fetching user '{email}': {db_err}")
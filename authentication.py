@@ -1,16 +1,131 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Union
+
+from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
+
+from settings import get_settings
+
+settings = get_settings()
+PASSWORD_HASH_WORKERS = settings.password_hash_workers
+PASSWORD_HASH_QUEUE_DEPTH = settings.password_hash_queue_depth
 
 
-pwd_context = CryptContext(schemes = ["bcrypt"],deprecated="auto")
+# passlib and bcrypt are imported on first use (mostly inside the hashing
+# worker processes), not when the app starts.
+_pwd_context = None
+
+def _context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes = ["bcrypt"],deprecated="auto")
+    return _pwd_context
 
 def hash_pwd(password: str):
-    return pwd_context.hash(password)
+    return _context().hash(password)
 
 def verify_password(plain_pwd, hash_pwd):
-    return pwd_context.verify(plain_pwd, hash_pwd)
+    return _context().verify(plain_pwd, hash_pwd)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl= "/login")
 
 
+# Runs inside a worker process; returns how long bcrypt itself took so the
+# caller can tell queue wait apart from hashing time.
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+class PasswordHasherSaturated(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Password service is busy, please retry",
+            headers={"Retry-After": "1"}
+        )
+
+
+class PasswordHasher:
+
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_sum = 0.0
+        self.queue_wait_max = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.in_flight >= self.workers + self.queue_depth:
+            self.rejected += 1
+            raise PasswordHasherSaturated()
+
+        self.in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            run_time, result = await loop.run_in_executor(self._get_executor(), _timed, func, *args)
+        finally:
+            self.in_flight -= 1
+
+        wait = max(time.perf_counter() - submitted - run_time, 0.0)
+        self.completed += 1
+        self.queue_wait_sum += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_pwd, password)
+
+    async def verify(self, plain_pwd: str, hashed_pwd: str) -> bool:
+        return await self._run(verify_password, plain_pwd, hashed_pwd)
+
+    # Hashes a batch using every worker while leaving the queue to other callers:
+    # at most `workers` of the batch are in flight at once. Each entry is either
+    # the hash or the exception raised for that password.
+    async def hash_many(self, passwords: List[str]) -> List[Union[str, BaseException]]:
+        slots = asyncio.Semaphore(self.workers)
+
+        async def hash_one(password: str) -> str:
+            async with slots:
+                return await self.hash(password)
+
+        return await asyncio.gather(*(hash_one(password) for password in passwords), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait_seconds_sum": self.queue_wait_sum,
+            "queue_wait_seconds_max": self.queue_wait_max,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_DEPTH)
+
+
+async def hash_pwd_async(password: str) -> str:
+    return await password_hasher.hash(password)
 
+async def verify_password_async(plain_pwd: str, hash_pwd: str) -> bool:
+    return await password_hasher.verify(plain_pwd, hash_pwd)
@@ -0,0 +1,42 @@
+import argparse
+import json
+
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "     n/a"
+    return f"{(after - before) / before * 100:+7.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two load driver result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline  {baseline['revision']['commit']}  {baseline['config']}")
+    print(f"candidate {candidate['revision']['commit']}  {candidate['config']}\n")
+    print(f"{'endpoint':<55}" + "".join(f"{metric:>22}" for metric in METRICS))
+
+    rows = [(name, baseline["endpoints"].get(name), candidate["endpoints"].get(name))
+            for name in sorted(set(baseline["endpoints"]) | set(candidate["endpoints"]))]
+    rows.append(("overall", baseline["overall"], candidate["overall"]))
+    for name, before, after in rows:
+        if before is None or after is None:
+            print(f"{name:<55}  only in {'candidate' if before is None else 'baseline'}")
+            continue
+        print(f"{name:<55}" + "".join(
+            f"{after[metric]:>13.1f}{change(before[metric], after[metric])}" for metric in METRICS
+        ))
+
+
+if __name__ == "__main__":
+    main()
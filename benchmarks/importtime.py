@@ -0,0 +1,51 @@
+import argparse
+import subprocess
+import sys
+from collections import defaultdict
+
+
+# Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+# summarises the stderr report: the slowest modules by cumulative time and the
+# total per top-level package.
+def import_times(module: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report where startup import time goes")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    rows = import_times(args.module)
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us
+
+    total = sum(self_us for _, self_us, _ in rows)
+    print(f"import {args.module}: {total / 1000:.1f} ms across {len(rows)} modules\n")
+
+    print(f"{'module':<60}{'self ms':>10}{'cumulative ms':>16}")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{name:<60}{self_us / 1000:>10.1f}{cumulative_us / 1000:>16.1f}")
+
+    print(f"\n{'package':<60}{'self ms':>10}")
+    for name, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<60}{self_us / 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import inspect
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import httpx
+
+
+@dataclass
+class Call:
+    method: str
+    url: str
+    role: Optional[str] = None
+    json: Optional[object] = None
+    content: Optional[bytes] = None
+    headers: Optional[dict] = None
+    user: Optional[dict] = None
+
+
+@dataclass
+class Scenario:
+    name: str
+    weight: float
+    build: Callable[["LoadContext"], Optional[Call]]
+    # May be a coroutine function; it is awaited before the call is recorded as done.
+    after: Optional[Callable[["LoadContext", Call, httpx.Response], None]] = None
+
+
+class LoadContext:
+
+    def __init__(self, manifest: dict, rng: random.Random):
+        self.manifest = manifest
+        self.rng = rng
+        self.sessions = {"doctor": [], "nurse": [], "management": []}
+        self.created_prescriptions = defaultdict(list)
+        self.relogins = {}
+        self.http: Optional[httpx.AsyncClient] = None
+
+    async def login(self, http: httpx.AsyncClient, users: int):
+        self.http = http
+        accounts = (
+            [("management", {"email": email}) for email in self.manifest["management"]]
+            + [("doctor", doctor) for doctor in self.manifest["doctors"][:users]]
+            + [("nurse", nurse) for nurse in self.manifest["nurses"][:users]]
+        )
+        for role, user in accounts:
+            response = await http.post("/login", json={"email": user["email"], "password": self.manifest["password"]})
+            response.raise_for_status()
+            self.sessions[role].append({**user, "token": response.json()["access_token"]})
+        print(f"logged in: { {role: len(sessions) for role, sessions in self.sessions.items()} }")
+
+    # A password change revokes the session's token, so the user logs in again.
+    # Calls for that user wait for the new token instead of failing with 401.
+    async def relogin(self, user: dict):
+        async def fetch():
+            response = await self.http.post("/login", json={"email": user["email"], "password": self.manifest["password"]})
+            if response.status_code == 200:
+                user["token"] = response.json()["access_token"]
+
+        task = self.relogins[user["email"]] = asyncio.ensure_future(fetch())
+        await task
+
+    async def ready(self, user: dict):
+        pending = self.relogins.get(user["email"])
+        if pending is not None and not pending.done():
+            await pending
+
+    def pick(self, role: str) -> dict:
+        return self.rng.choice(self.sessions[role])
+
+    def medicine_lines(self, count: int) -> list:
+        return [
+            {"medicine_id": medicine_id, "quantity": self.rng.randint(1, 3)}
+            for medicine_id in self.rng.sample(self.manifest["medicines"], k=count)
+        ]
+
+    def prescription_body(self) -> dict:
+        return {
+            "patient_id": f"load-{uuid.uuid4().hex[:12]}",
+            "patient_name": "Load Test",
+            "description": "Created by the load driver",
+            "expiry": (datetime.utcnow() + timedelta(days=30)).isoformat(),
+            "medicines": self.medicine_lines(self.rng.randint(1, 3))
+        }
+
+    def own_prescription(self, doctor: dict, pop: bool = False) -> Optional[str]:
+        created = self.created_prescriptions[doctor["id"]]
+        if pop:
+            return created.pop() if created else None
+        ids = created + doctor["prescriptions"]
+        return self.rng.choice(ids) if ids else None
+
+
+def build_scenarios() -> list:
+    def create_prescription(ctx):
+        return Call("POST", "/doctor/create_prescription", "doctor", json=ctx.prescription_body())
+
+    def create_prescriptions(ctx):
+        return Call("POST", "/doctor/create_prescriptions", "doctor",
+                    json={"prescriptions": [ctx.prescription_body() for _ in range(10)]})
+
+    def remember_prescriptions(ctx, call, response):
+        if response.status_code == 200:
+            ctx.created_prescriptions[call.user["id"]].extend(
+                item["prescription_id"] for item in response.json()["results"] if item.get("prescription_id")
+            )
+
+    def read_prescription(ctx):
+        doctor = ctx.pick("doctor")
+        id = ctx.own_prescription(doctor)
+        return Call("GET", f"/doctor/read_prescription_by_id/{id}", "doctor", user=doctor) if id else None
+
+    def read_all_prescriptions(ctx):
+        return Call("GET", "/doctor/read_all_prescriptions?limit=50", "doctor")
+
+    def update_prescription(ctx):
+        doctor = ctx.pick("doctor")
+        id = ctx.own_prescription(doctor)
+        return Call("PUT", f"/doctor/update_prescription_by_id/{id}", "doctor", user=doctor,
+                    json={"description": f"Updated {uuid.uuid4().hex[:8]}"}) if id else None
+
+    def delete_prescription(ctx):
+        doctor = ctx.pick("doctor")
+        id = ctx.own_prescription(doctor, pop=True)
+        return Call("DELETE", f"/doctor/delete_prescription_by_id/{id}", "doctor", user=doctor) if id else None
+
+    def change_password(role):
+        return lambda ctx: Call("PUT", f"/{role}/change_{role}_password", role, json={
+            "old_password": ctx.manifest["password"], "new_password": ctx.manifest["password"]
+        })
+
+    async def relogin(ctx, call, response):
+        if response.status_code == 200:
+            await ctx.relogin(call.user)
+
+    def read_all_medicines(ctx):
+        return Call("GET", "/nurse/read_all_medicines?limit=50", "nurse")
+
+    def read_medicine(ctx):
+        nurse = ctx.pick("nurse")
+        return Call("GET", f"/nurse/read_medicine_by_id/{ctx.rng.choice(nurse['medicines'])}", "nurse", user=nurse) \
+            if nurse["medicines"] else None
+
+    def create_medicine(ctx):
+        return Call("POST", "/nurse/create_medicine", "nurse", json={
+            "medicine_name": f"Load {uuid.uuid4().hex[:8]}",
+            "expiry": (datetime.utcnow() + timedelta(days=365)).isoformat(),
+            "quantity": 100
+        })
+
+    def update_medicine(ctx):
+        nurse = ctx.pick("nurse")
+        return Call("PUT", f"/nurse/update_medicine_by_id/{ctx.rng.choice(nurse['medicines'])}", "nurse", user=nurse, json={
+            "expiry": (datetime.utcnow() + timedelta(days=ctx.rng.randint(30, 720))).isoformat()
+        }) if nurse["medicines"] else None
+
+    def delete_medicine(ctx):
+        nurse = ctx.pick("nurse")
+        disposable = nurse.get("disposable") or []
+        return Call("DELETE", f"/nurse/delete_medicine_by_id/{disposable.pop()}", "nurse", user=nurse) if disposable else None
+
+    def import_medicines(ctx):
+        expiry = (datetime.utcnow() + timedelta(days=180)).date().isoformat()
+        rows = [
+            json.dumps({"medicine_name": f"Import {ctx.rng.randrange(50)}", "expiry": expiry, "quantity": ctx.rng.randint(1, 50)})
+            for _ in range(200)
+        ]
+        return Call("POST", "/nurse/import_medicines", "nurse", content="\n".join(rows).encode(),
+                    headers={"content-type": "application/x-ndjson"})
+
+    def fetch_for_doctor(url):
+        def build(ctx):
+            return Call("GET", url.format(ctx.rng.choice(ctx.manifest["doctors"])["id"]), "management")
+        return build
+
+    def new_staff(role):
+        def build(ctx):
+            suffix = uuid.uuid4().hex[:12]
+            return Call("POST", f"/management/create_{role}", "management", json={
+                "username": f"load-{suffix}", "password": ctx.manifest["password"], "email": f"load-{suffix}@bench.local"
+            })
+        return build
+
+    def onboard_staff(ctx):
+        staff = []
+        for _ in range(10):
+            suffix = uuid.uuid4().hex[:12]
+            staff.append({"username": f"load-{suffix}", "password": ctx.manifest["password"],
+                          "email": f"load-{suffix}@bench.local", "role": ctx.rng.choice(["doctor", "nurse"])})
+        return Call("POST", "/management/onboard_staff", "management", json=staff)
+
+    def login(ctx):
+        user = ctx.rng.choice(ctx.manifest["doctors"] + ctx.manifest["nurses"])
+        return Call("POST", "/login", json={"email": user["email"], "password": ctx.manifest["password"]})
+
+    def register(ctx):
+        suffix = uuid.uuid4().hex[:12]
+        return Call("POST", "/register", "management", json={
+            "username": f"load-{suffix}", "password": ctx.manifest["password"], "email": f"load-{suffix}@bench.local"
+        })
+
+    # Weights roughly follow a ward's day: mostly reads, some prescribing, rare
+    # account management.
+    return [
+        Scenario("POST /doctor/create_prescription", 10, create_prescription),
+        Scenario("POST /doctor/create_prescriptions", 1, create_prescriptions, remember_prescriptions),
+        Scenario("GET /doctor/read_prescription_by_id/{id}", 15, read_prescription),
+        Scenario("GET /doctor/read_all_prescriptions", 15, read_all_prescriptions),
+        Scenario("PUT /doctor/update_prescription_by_id/{id}", 4, update_prescription),
+        Scenario("DELETE /doctor/delete_prescription_by_id/{id}", 2, delete_prescription),
+        Scenario("PUT /doctor/change_doctor_password", 0.5, change_password("doctor"), relogin),
+        Scenario("GET /nurse/read_all_medicines", 8, read_all_medicines),
+        Scenario("GET /nurse/read_medicine_by_id/{id}", 8, read_medicine),
+        Scenario("POST /nurse/create_medicine", 2, create_medicine),
+        Scenario("PUT /nurse/update_medicine_by_id/{id}", 2, update_medicine),
+        Scenario("DELETE /nurse/delete_medicine_by_id/{id}", 1, delete_medicine),
+        Scenario("POST /nurse/import_medicines", 0.5, import_medicines),
+        Scenario("PUT /nurse/change_nurse_password", 0.5, change_password("nurse"), relogin),
+        Scenario("GET /fetch_prescriptions_from_doctor_id/{doctor_id}", 6, fetch_for_doctor("/fetch_prescriptions_from_doctor_id/{}?limit=50")),
+        Scenario("GET /fetch_pres_from_dr_arg/{doctor_id}", 6, fetch_for_doctor("/fetch_pres_from_dr_arg/{}?limit=50")),
+        Scenario("GET /read_all_doctors", 3, lambda ctx: Call("GET", "/read_all_doctors?limit=50", "management")),
+        Scenario("GET /read_all_nurses", 3, lambda ctx: Call("GET", "/read_all_nurses?limit=50", "management")),
+        Scenario("POST /management/create_doctor", 0.5, new_staff("doctor")),
+        Scenario("POST /management/create_nurse", 0.5, new_staff("nurse")),
+        Scenario("POST /management/onboard_staff", 0.2, onboard_staff),
+        Scenario("POST /login", 2, login),
+        Scenario("POST /register", 0.2, register),
+    ]
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies: list, statuses: Counter, elapsed: float) -> dict:
+    values = sorted(latencies)
+    count = len(values)
+    errors = sum(n for status, n in statuses.items() if not str(status).startswith("2"))
+    return {
+        "count": count,
+        "errors": errors,
+        "statuses": {str(status): n for status, n in statuses.items()},
+        "throughput_rps": count / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "max_ms": (values[-1] if values else 0.0) * 1000,
+    }
+
+
+def git_revision() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+async def run(args) -> dict:
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    rng = random.Random(args.seed)
+    scenarios = [s for s in build_scenarios() if re.search(args.only, s.name)]
+    if not scenarios:
+        raise SystemExit(f"No scenario matches {args.only!r}")
+    weights = [s.weight for s in scenarios]
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    skipped = Counter()
+    dropped = 0
+    in_flight = 0
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as http:
+        ctx = LoadContext(manifest, rng)
+        await ctx.login(http, args.users)
+
+        async def fire(scenario: Scenario, scheduled: float):
+            nonlocal in_flight
+            call = scenario.build(ctx)
+            if call is None:
+                skipped[scenario.name] += 1
+                return
+
+            headers = dict(call.headers or {})
+            if call.role:
+                call.user = call.user or ctx.pick(call.role)
+                await ctx.ready(call.user)
+                headers["Authorization"] = f"Bearer {call.user['token']}"
+
+            in_flight += 1
+            try:
+                response = await http.request(call.method, call.url, json=call.json, content=call.content, headers=headers)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            finally:
+                in_flight -= 1
+
+            # Latency counts from the scheduled start, so time spent queued behind a
+            # slow server is included rather than hidden (coordinated omission).
+            latencies[scenario.name].append(time.perf_counter() - scheduled)
+            statuses[scenario.name][status] += 1
+            if response is not None and scenario.after is not None:
+                done = scenario.after(ctx, call, response)
+                if inspect.isawaitable(done):
+                    await done
+
+        total = int(args.rate * args.duration)
+        interval = 1.0 / args.rate
+        tasks = []
+        started = time.perf_counter()
+        for i in range(total):
+            scheduled = started + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if in_flight >= args.max_in_flight:
+                dropped += 1
+                continue
+            scenario = rng.choices(scenarios, weights=weights)[0]
+            tasks.append(asyncio.create_task(fire(scenario, scheduled)))
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    endpoints = {name: summarize(latencies[name], statuses[name], elapsed) for name in sorted(latencies)}
+    overall = summarize([v for values in latencies.values() for v in values],
+                        sum(statuses.values(), Counter()), elapsed)
+    return {
+        "revision": git_revision(),
+        "started_at": datetime.utcnow().isoformat(),
+        "config": {
+            "base_url": args.base_url, "rate": args.rate, "duration": args.duration, "users": args.users,
+            "connections": args.connections, "max_in_flight": args.max_in_flight, "only": args.only,
+            "seed": args.seed, "dataset": manifest.get("counts")
+        },
+        "elapsed_s": elapsed,
+        "dropped": dropped,
+        "skipped": dict(skipped),
+        "overall": overall,
+        "endpoints": endpoints,
+    }
+
+
+def print_report(result: dict):
+    print(f"\n{'endpoint':<55} {'count':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    rows = list(result["endpoints"].items()) + [("overall", result["overall"])]
+    for name, stats in rows:
+        print(f"{name:<55} {stats['count']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+              f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+    if result["dropped"]:
+        print(f"\n{result['dropped']} requests dropped at the client (max in-flight reached)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load driver for every API route")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--manifest", default="benchmarks/manifest.json")
+    parser.add_argument("--rate", type=float, default=100.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to generate load for")
+    parser.add_argument("--users", type=int, default=20, help="Doctors and nurses to log in as")
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--only", default="", help="Regex on scenario names, e.g. 'GET /doctor'")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=None, help="Result file (default benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    out = args.out or os.path.join(
+        "benchmarks", "results",
+        f"{datetime.utcnow():%Y%m%dT%H%M%S}-{result['revision']['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nresults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
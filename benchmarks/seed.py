@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+
+from authentication import hash_pwd
+from DB.indexes import ensure_indexes
+
+
+BENCH_PASSWORD = "bench-password"
+SAMPLE_USERS = 50
+SAMPLE_IDS = 50
+DISPOSABLE_MEDICINES = 200
+
+
+def zipf_cum_weights(count: int, skew: float) -> list:
+    return list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def staff_docs(role: str, count: int, hashed: str, now: datetime) -> list:
+    return [
+        {
+            "_id": ObjectId(),
+            "username": f"{role}{i}",
+            "password": hashed,
+            "email": f"{role}{i}@bench.local",
+            "role": role,
+            "is_active": True,
+            "created_at": now - timedelta(minutes=i)
+        }
+        for i in range(count)
+    ]
+
+
+async def insert_batches(collection, docs_iter, batch_size: int, concurrency: int) -> int:
+    slots = asyncio.Semaphore(concurrency)
+    pending = set()
+    inserted = 0
+
+    async def insert(batch):
+        try:
+            await collection.insert_many(batch, ordered=False)
+        finally:
+            slots.release()
+
+    # Finished tasks leave `pending`, so their errors are kept here and the
+    # first one is re-raised instead of reporting a short seed as a success.
+    failures = []
+
+    def finished(task: asyncio.Task):
+        pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            failures.append(task.exception())
+
+    # A slot is taken before the batch is handed off, so at most `concurrency`
+    # batches are held in memory at once.
+    while not failures:
+        batch = list(itertools.islice(docs_iter, batch_size))
+        if not batch:
+            break
+        await slots.acquire()
+        task = asyncio.create_task(insert(batch))
+        pending.add(task)
+        task.add_done_callback(finished)
+        inserted += len(batch)
+        if inserted % (batch_size * 50) == 0:
+            print(f"  {collection.name}: {inserted} queued")
+
+    await asyncio.gather(*pending, return_exceptions=True)
+    if failures:
+        raise failures[0]
+    return inserted
+
+
+async def seed(args):
+    rng = random.Random(args.seed)
+    client = AsyncMongoClient(args.uri)
+    db = client[args.db]
+    now = datetime.utcnow()
+
+    if args.drop:
+        for name in ("user", "prescriptions", "medicine"):
+            await db[name].drop()
+
+    started = time.perf_counter()
+    report = await ensure_indexes(db)
+    print(f"indexes: {report}")
+
+    # One bcrypt hash shared by every seeded account keeps seeding fast and lets
+    # the load driver log in as any of them.
+    hashed = hash_pwd(BENCH_PASSWORD)
+    management = staff_docs("management", 1, hashed, now)
+    doctors = staff_docs("doctor", args.doctors, hashed, now)
+    nurses = staff_docs("nurse", args.nurses, hashed, now)
+    await db["user"].insert_many(management + doctors + nurses, ordered=False)
+    print(f"users: {len(doctors)} doctors, {len(nurses)} nurses")
+
+    medicines = [
+        {
+            "_id": ObjectId(),
+            "medicine_name": f"Medicine {i}",
+            "expiry": now + timedelta(days=rng.randint(30, 720)),
+            "quantity": args.stock,
+            "nurse_id": nurses[i % len(nurses)]["_id"],
+            "created_at": now - timedelta(seconds=i)
+        }
+        for i in range(args.medicines)
+    ]
+    # Never prescribed, so the load driver can delete them without breaking stock
+    # reservations for seeded prescriptions.
+    disposable = [
+        {
+            "_id": ObjectId(),
+            "medicine_name": f"Disposable {i}",
+            "expiry": now + timedelta(days=365),
+            "quantity": 1,
+            "nurse_id": nurses[i % min(len(nurses), SAMPLE_USERS)]["_id"],
+            "created_at": now - timedelta(seconds=i)
+        }
+        for i in range(DISPOSABLE_MEDICINES * min(len(nurses), SAMPLE_USERS))
+    ]
+    await insert_batches(db["medicine"], iter(medicines + disposable), args.batch_size, args.concurrency)
+    print(f"medicines: {len(medicines)} (+{len(disposable)} disposable)")
+
+    # Doctors are ranked by a Zipf distribution, so a handful of them own most
+    # prescriptions, like the busiest wards do.
+    cum_weights = zipf_cum_weights(len(doctors), args.skew)
+    doctor_ids = [doctor["_id"] for doctor in doctors]
+    medicine_ids = [str(medicine["_id"]) for medicine in medicines]
+    samples = {doctor["_id"]: [] for doctor in doctors[:SAMPLE_USERS]}
+    span = timedelta(days=args.days).total_seconds()
+
+    def prescriptions():
+        for i in range(args.prescriptions):
+            doctor_id = rng.choices(doctor_ids, cum_weights=cum_weights)[0]
+            doc = {
+                "_id": ObjectId(),
+                "patient_id": f"patient-{rng.randrange(args.prescriptions // 3 + 1)}",
+                "patient_name": f"Patient {i}",
+                "description": "Seeded prescription",
+                "expiry": now + timedelta(days=rng.randint(7, 90)),
+                "medicines": [
+                    {"medicine_id": medicine_id, "quantity": rng.randint(1, 5)}
+                    for medicine_id in rng.sample(medicine_ids, k=min(rng.randint(1, 3), len(medicine_ids)))
+                ],
+                "completed": rng.random() < 0.3,
+                "created_at": now - timedelta(seconds=rng.random() * span),
+                "doctor_id": doctor_id
+            }
+            sample = samples.get(doctor_id)
+            if sample is not None and len(sample) < SAMPLE_IDS:
+                sample.append(str(doc["_id"]))
+            yield doc
+
+    count = await insert_batches(db["prescriptions"], prescriptions(), args.batch_size, args.concurrency)
+    print(f"prescriptions: {count} in {time.perf_counter() - started:.1f}s")
+
+    manifest = {
+        "db": args.db,
+        "password": BENCH_PASSWORD,
+        "management": [doc["email"] for doc in management],
+        "doctors": [
+            {"id": str(doctor["_id"]), "email": doctor["email"], "prescriptions": samples[doctor["_id"]]}
+            for doctor in doctors[:SAMPLE_USERS]
+        ],
+        "nurses": [
+            {
+                "id": str(nurse["_id"]),
+                "email": nurse["email"],
+                "medicines": [str(m["_id"]) for m in medicines if m["nurse_id"] == nurse["_id"]][:SAMPLE_IDS],
+                "disposable": [str(m["_id"]) for m in disposable if m["nurse_id"] == nurse["_id"]]
+            }
+            for nurse in nurses[:SAMPLE_USERS]
+        ],
+        "medicines": medicine_ids[:SAMPLE_IDS * 4],
+        "counts": {
+            "doctors": args.doctors,
+            "nurses": args.nurses,
+            "medicines": args.medicines,
+            "prescriptions": args.prescriptions,
+            "skew": args.skew
+        }
+    }
+    with open(args.manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"manifest written to {args.manifest}")
+
+    await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a local mongod with benchmark data")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="hospital_db")
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--nurses", type=int, default=100)
+    parser.add_argument("--medicines", type=int, default=5000)
+    parser.add_argument("--prescriptions", type=int, default=2_000_000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of prescriptions per doctor")
+    parser.add_argument("--days", type=int, default=365, help="Spread of prescription created_at")
+    parser.add_argument("--stock", type=int, default=1_000_000_000, help="Starting quantity per medicine")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manifest", default="benchmarks/manifest.json")
+    parser.add_argument("--drop", action="store_true", help="Drop the collections first")
+    asyncio.run(seed(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+try:
+    from fastapi.utils import create_model_field
+except ImportError:
+    from fastapi.utils import create_response_field as create_model_field
+
+from DB.schemas import PrescriptionPage, ReadMedicine, ReadPrescription
+from responses import FastJSONResponse, orjson
+
+
+def build_page(count: int, medicines: int) -> PrescriptionPage:
+    now = datetime.utcnow()
+    return PrescriptionPage(
+        items=[
+            ReadPrescription(
+                prescription_id=f"{i:024x}",
+                user_id=f"{i % 97:024x}",
+                patient_name=f"Patient {i}",
+                description="Take after meals",
+                completed=bool(i % 2),
+                medicines=[
+                    ReadMedicine(
+                        medicine_name=f"Medicine {m}",
+                        quantity=m + 1,
+                        expiry=now + timedelta(days=m),
+                        created_at=now
+                    )
+                    for m in range(medicines)
+                ],
+                expiry=now + timedelta(days=30),
+                created_at=now - timedelta(seconds=i)
+            )
+            for i in range(count)
+        ],
+        next_cursor=None
+    )
+
+
+# What FastAPI does for `return page` on a route with response_model=PrescriptionPage.
+async def response_model_path(field, page: PrescriptionPage) -> bytes:
+    content = await serialize_response(field=field, response_content=page, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+def fast_path(page: PrescriptionPage) -> bytes:
+    return FastJSONResponse(page).body
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-item cost of serializing a prescription page")
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--medicines", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    page = build_page(args.items, args.medicines)
+    field = create_model_field(name="Response_read_all_prescriptions", type_=PrescriptionPage, mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    results = {
+        "response_model": best_of(args.repeat, lambda: loop.run_until_complete(response_model_path(field, page))),
+        "fast_json": best_of(args.repeat, lambda: fast_path(page)),
+    }
+    loop.close()
+
+    print(f"{args.items} prescriptions x {args.medicines} medicines, encoder: {'orjson' if orjson else 'stdlib json'}")
+    for name, seconds in results.items():
+        print(f"{name:>15}: {seconds * 1000:8.1f} ms total  {seconds / args.items * 1e6:7.2f} us/item")
+    print(f"{'speedup':>15}: {results['response_model'] / results['fast_json']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,53 @@
-from pymongo.collection import Collection  
+from dataclasses import dataclass
 
-from DB.mongodb import (
-    user_collection,
-    prescription_collection,
-    medicine_collection,
-)
+from fastapi import Request
+from pymongo.asynchronous.collection import AsyncCollection
 
-def get_user_collection() -> Collection:
-    return user_collection 
+from cache import LRUCache
+from DB.mongodb import MongoDatabase
+from Repositories.medicine_repository import MedicineRepository
+from Repositories.prescription_repository import PrescriptionRepository
+from Repositories.user_repository import UserRepository
+from settings import get_settings
 
-def get_prescription_collection() -> Collection:
-    return prescription_collection
 
-def get_medicine_collection() -> Collection:
-    return medicine_collection
+settings = get_settings()
+
+medicine_cache = LRUCache(maxsize=settings.medicine_cache_size, ttl=settings.medicine_cache_ttl)
+
+
+@dataclass
+class Repositories:
+    user: UserRepository
+    prescription: PrescriptionRepository
+    medicine: MedicineRepository
+
+
+def build_repositories(database: MongoDatabase) -> Repositories:
+    medicine_cache.clear()
+    return Repositories(
+        user=UserRepository(database.user_collection),
+        prescription=PrescriptionRepository(database.prescription_collection),
+        medicine=MedicineRepository(database.medicine_collection, cache=medicine_cache, transactions=database.transactions),
+    )
+
+
+# The database and repositories are created by the app lifespan and kept on
+# app.state; these are the FastAPI dependencies that hand them out.
+def get_user_collection(request: Request) -> AsyncCollection:
+    return request.app.state.database.user_collection
+
+def get_prescription_collection(request: Request) -> AsyncCollection:
+    return request.app.state.database.prescription_collection
+
+def get_medicine_collection(request: Request) -> AsyncCollection:
+    return request.app.state.database.medicine_collection
+
+def get_user_repository(request: Request) -> UserRepository:
+    return request.app.state.repositories.user
+
+def get_prescription_repository(request: Request) -> PrescriptionRepository:
+    return request.app.state.repositories.prescription
+
+def get_medicine_repository(request: Request) -> MedicineRepository:
+    return request.app.state.repositories.medicine
@@ -0,0 +1,314 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+from settings import get_settings
+
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+DEBUG_DB_QUERIES = get_settings().debug_db_queries
+
+# Commands issued by the current request. Holds a one-item list rather than an
+# int so increments made in copied contexts still land on the request's counter.
+_query_counter: ContextVar[Optional[List[int]]] = ContextVar("db_query_counter", default=None)
+
+# Called with (route, query_count) after every matched request; tests hook in here.
+query_observers: List[Callable[[object, int], None]] = []
+
+
+def query_budget(limit: Optional[int]):
+    def decorate(func):
+        func.query_budget = limit
+        return func
+    return decorate
+
+
+def current_query_count() -> int:
+    counter = _query_counter.get()
+    return counter[0] if counter is not None else 0
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labelnames, labels)} {value}" for labels, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = HTTP_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+
+        lines = self.header()
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._stats: List[Tuple[str, Callable[[], dict]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    # Exposes the numeric values of an existing stats() dict as gauges named
+    # `<prefix>_<key>`, read at scrape time.
+    def register_stats(self, prefix: str, stats: Callable[[], dict]):
+        self._stats.append((prefix, stats))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats in self._stats:
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method", "route")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status"), HTTP_BUCKETS))
+mongo_command_duration = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("command",), MONGO_BUCKETS))
+mongo_commands_total = registry.register(Counter(
+    "mongodb_commands_total", "MongoDB commands by collection and outcome", ("collection", "command", "outcome")))
+mongo_pool_checkout_wait = registry.register(Histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", (), MONGO_BUCKETS))
+mongo_pool_checkout_failures = registry.register(Counter(
+    "mongodb_pool_checkout_failures_total", "Failed connection checkouts by reason", ("reason",)))
+
+
+# Pure ASGI so the response body is not buffered. The route template is resolved
+# up front so in-flight requests can be labelled too; unmatched paths share one
+# label to keep cardinality bounded.
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route(self, scope) -> str:
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "unmatched")
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec(method, route)
+            http_request_duration.observe(time.perf_counter() - started, method, route, status)
+
+
+# Counts the Mongo commands each request issues and, with DEBUG_DB_QUERIES=1,
+# reports them in an X-DB-Queries response header.
+class QueryCountMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = [0]
+        token = _query_counter.set(counter)
+
+        async def send_with_count(message):
+            if DEBUG_DB_QUERIES and message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-db-queries", str(counter[0]).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _query_counter.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                for observer in query_observers:
+                    observer(route, counter[0])
+
+
+class CommandMetrics(monitoring.CommandListener):
+
+    def __init__(self):
+        self._collections: Dict[Tuple[object, int], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        counter = _query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+        target = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def _finish(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name)
+        mongo_commands_total.inc(collection, event.command_name, outcome)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, "success")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, "failure")
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+
+    def __init__(self):
+        self._checkout_started: Dict[object, List[float]] = {}
+
+    # Older pymongo events carry no duration, so the wait is also measured from
+    # the matching checkout-started event per pool address.
+    def _elapsed(self, event) -> Optional[float]:
+        duration = getattr(event, "duration", None)
+        pending = self._checkout_started.get(event.address)
+        started = pending.pop(0) if pending else None
+        if duration is not None:
+            return duration
+        return time.perf_counter() - started if started is not None else None
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.setdefault(event.address, []).append(time.perf_counter())
+
+    def connection_checked_out(self, event):
+        wait = self._elapsed(event)
+        if wait is not None:
+            mongo_pool_checkout_wait.observe(wait)
+
+    def connection_check_out_failed(self, event):
+        self._elapsed(event)
+        mongo_pool_checkout_failures.inc(str(event.reason))
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        self._checkout_started.pop(event.address, None)
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+command_metrics = CommandMetrics()
+pool_metrics = PoolMetrics()
+
+
+def render_metrics() -> str:
+    return registry.render()
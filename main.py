@@ -1,25 +1,76 @@
-from fastapi import FastAPI, APIRouter
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, APIRouter, Response
 from fastapi.middleware.cors import CORSMiddleware  # Add this import
+from pymongo import AsyncMongoClient
 
 from Routes import staff_routes, user_routes, prescription_routes, medicine_routes
+from DB.mongodb import open_database
+from DB.indexes import ensure_indexes
+from authentication import password_hasher
+from configurations import build_repositories, medicine_cache
+from instrumentation import MetricsMiddleware, QueryCountMiddleware, registry, render_metrics
+from middleware import compile_route_roles, token_cache
+from request_logging import RequestLogMiddleware, configure_logging
+from settings import get_settings
 
-app = FastAPI()
 router = APIRouter()
 
-# Add CORS middleware - ADD THIS SECTION
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # React app URL
-    allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods (GET, POST, PUT, DELETE, etc.)
-    allow_headers=["*"],  # Allows all headers
-)
-
-@app.get("/home")
-def home():
-    return {"Successfull!"}
-
-app.include_router(user_routes.user_auth_route)
-app.include_router(prescription_routes.prescription_crud_route)
-app.include_router(staff_routes.staff_router)
-app.include_router(medicine_routes.medicine_router)
\ No newline at end of file
+configure_logging(get_settings())
+
+registry.register_stats("medicine_cache", medicine_cache.stats)
+registry.register_stats("token_cache", token_cache.stats)
+registry.register_stats("password_hasher", password_hasher.stats)
+
+
+# Tests pass their own client; it is used as-is and left open on shutdown.
+def create_app(mongo_client: Optional[AsyncMongoClient] = None) -> FastAPI:
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        settings = get_settings()
+        database = open_database(settings, mongo_client)
+        try:
+            await database.warm_up(settings.mongo_min_pool_size)
+            await database.detect_transactions()
+            await ensure_indexes(database.db)
+            app.state.database = database
+            app.state.repositories = build_repositories(database)
+            yield
+        finally:
+            password_hasher.shutdown()
+            await database.close()
+
+    app = FastAPI(lifespan=lifespan)
+
+    # Add CORS middleware - ADD THIS SECTION
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # React app URL
+        allow_credentials=True,
+        allow_methods=["*"],  # Allows all methods (GET, POST, PUT, DELETE, etc.)
+        allow_headers=["*"],  # Allows all headers
+    )
+    app.add_middleware(RequestLogMiddleware, read_sample_rate=get_settings().log_read_sample_rate)
+    app.add_middleware(QueryCountMiddleware)
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/home")
+    def home():
+        return {"Successfull!"}
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    app.include_router(user_routes.user_auth_route)
+    app.include_router(prescription_routes.prescription_crud_route)
+    app.include_router(staff_routes.staff_router)
+    app.include_router(medicine_routes.medicine_router)
+
+    app.state.route_roles = compile_route_roles(app.routes)
+    return app
+
+
+app = create_app()
@@ -1,19 +1,26 @@
-from functools import wraps
+import hashlib
 import logging
+import time
+from bson import ObjectId
+from bson.errors import InvalidId
 from fastapi import HTTPException, Request, status
-from jose import jwt, JWTError, ExpiredSignatureError
+from fastapi.routing import APIRoute
 from datetime import datetime, timedelta, timezone
-from dotenv import load_dotenv
-import os
+from typing import Dict, FrozenSet
+
+from cache import LRUCache
+from Repositories.user_repository import UserRepository
+from settings import get_settings
 
-load_dotenv()
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Configuration
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-TOKEN_EXPIRY = os.getenv("TOKEN_EXPIRY")
+settings = get_settings()
+SECRET_KEY = settings.secret_key
+ALGORITHM = settings.algorithm
+TOKEN_EXPIRY = settings.token_expiry_minutes
+TOKEN_CACHE_SIZE = settings.token_cache_size
+TOKEN_REVOCATION_TTL = settings.token_revocation_ttl
 
 
 ROLE_ACCESS = {
@@ -22,50 +29,132 @@ ROLE_ACCESS = {
     "management": ["management"]
 }
 
+# Routes reachable without a token; every other route must depend on authorize.
+PUBLIC_PATHS = {"/login", "/home", "/metrics"}
+
+
+class InvalidToken(Exception):
+    pass
+
 
+class TokenExpired(InvalidToken):
+    pass
+
+
+# jose is imported on first use so it stays out of the startup import graph.
+# `iat` keeps sub-second precision so a password change revokes tokens issued
+# earlier in the same second.
 def create_access_token(data: dict) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(minutes=TOKEN_EXPIRY)
-    to_encode.update({"exp": expire})
+    issued = time.time()
+    to_encode.update({"iat": issued, "exp": datetime.fromtimestamp(issued, timezone.utc) + timedelta(minutes=TOKEN_EXPIRY)})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def require_auth(func):
-    @wraps(func)
-    async def wrapper(request: Request, *args, **kwargs):
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Missing or invalid token")
-        
-        token = auth_header.split(" ")[1]
+# Verified claims keyed by a digest of the token, so the raw token never sits in
+# memory as a key. Entries expire at the token's own `exp`.
+token_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE)
+
+# user_id -> the user's `tokens_valid_after` (epoch seconds, 0.0 if never set), as
+# read from the user document. Entries are re-read after TOKEN_REVOCATION_TTL, so
+# a password change made through another worker takes effect here within that.
+tokens_valid_after = LRUCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_REVOCATION_TTL)
+
+
+def verify_token(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    from jose import jwt, JWTError, ExpiredSignatureError
+
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except ExpiredSignatureError as e:
+        raise TokenExpired(str(e))
+    except JWTError as e:
+        raise InvalidToken(str(e))
+
+    if claims.get("exp") is not None:
+        token_cache.set(key, claims, expires_at=float(claims["exp"]))
+    return claims
+
+
+async def check_not_revoked(claims: dict, user_repo: UserRepository) -> dict:
+    user_id = claims.get("user_id")
+    valid_after = tokens_valid_after.get(user_id)
+    if valid_after is None:
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            request.state.user_id = payload.get("user_id")
-            request.state.role = payload.get("role")
-            logger.info(f"Auth successful - user_id: {request.state.user_id}, role: {request.state.role}")
-        except JWTError as e:
-            logger.error(f"JWT decode error: {e}")
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
-        return await func(request, *args, **kwargs)
-    return wrapper
-
-
-def require_role(func):
-    @wraps(func)
-    async def wrapper(request: Request, *args, **kwargs):
-        role = getattr(request.state, "role", None)
-        if not role:
-            raise HTTPException(status_code=401, detail="Role not found")
-
-        endpoint = request.scope.get("route")
-        tags = getattr(endpoint, "tags", False)
-
-        if tags:
-            authorized = any(role in ROLE_ACCESS.get(tag, []) for tag in tags)
-
-            if not authorized:
-                raise HTTPException(status_code=403, detail=f"Role '{role}' not authorized for this route")
-                
-
-        return await func(request, *args, **kwargs)
-    return wrapper
+            valid_after = await user_repo.tokens_valid_after(ObjectId(user_id))
+        except (InvalidId, TypeError):
+            raise InvalidToken("Token has no valid user_id")
+        tokens_valid_after.set(user_id, valid_after)
+
+    if claims.get("iat", 0) < valid_after:
+        raise InvalidToken("Token was revoked")
+    return claims
+
+
+# Called after `tokens_valid_after` was written to the user document, so this
+# worker stops accepting the old tokens without waiting for its entry to expire.
+def invalidate_user_tokens(user_id: str, valid_after: float):
+    tokens_valid_after.set(user_id, valid_after)
+
+
+# Allowed roles per route, compiled once at startup by compile_route_roles from
+# each protected route's tags. Keyed by id() of the app's own route objects (what
+# request.scope["route"] holds); Starlette routes define __eq__ and aren't hashable.
+async def authorize(request: Request):
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid token")
+
+    token = auth_header.split(" ")[1]
+    try:
+        payload = await check_not_revoked(verify_token(token), request.app.state.repositories.user)
+    except InvalidToken as e:
+        logger.error(f"JWT decode error: {e}")
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    role = payload.get("role")
+    if not role:
+        raise HTTPException(status_code=401, detail="Role not found")
+
+    allowed = request.app.state.route_roles.get(id(request.scope.get("route")))
+    if not allowed or role not in allowed:
+        raise HTTPException(status_code=403, detail=f"Role '{role}' not authorized for this route")
+
+    request.state.user_id = payload.get("user_id")
+    request.state.role = role
+    logger.debug("Auth successful - role: %s", role)
+
+
+def _is_protected(route: APIRoute) -> bool:
+    return any(dependency.call is authorize for dependency in route.dependant.dependencies)
+
+
+# Fails startup if a route is neither public nor protected, or is protected but
+# none of its tags grant any role.
+def compile_route_roles(routes) -> Dict[int, FrozenSet[str]]:
+    table = {}
+    problems = []
+    for route in routes:
+        if not isinstance(route, APIRoute):
+            continue
+        if not _is_protected(route):
+            if route.path not in PUBLIC_PATHS:
+                problems.append(f"{','.join(sorted(route.methods))} {route.path}: no authorize dependency")
+            continue
+
+        roles = frozenset(role for tag in route.tags for role in ROLE_ACCESS.get(tag, []))
+        if not roles:
+            problems.append(f"{','.join(sorted(route.methods))} {route.path}: tags {route.tags} grant no role")
+            continue
+        table[id(route)] = roles
+
+    if problems:
+        raise RuntimeError("Route authorization is incomplete:\n" + "\n".join(problems))
+    return table
@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Newest first; _id breaks ties between documents created in the same millisecond.
+SEEK_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(created_at: Optional[datetime], object_id: ObjectId) -> str:
+    raw = json.dumps({
+        "t": created_at.isoformat() if created_at else None,
+        "id": str(object_id),
+    }, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(data["t"]) if data["t"] else None
+        return created_at, ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def seek_filter(cursor: Optional[str]) -> dict:
+    if not cursor:
+        return {}
+
+    created_at, object_id = decode_cursor(cursor)
+    if created_at is None:
+        return {"created_at": None, "_id": {"$lt": object_id}}
+
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": object_id}},
+        {"created_at": None},
+    ]}
+
+
+def split_page(docs: List[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+    # Callers fetch `limit + 1` documents; the extra one only tells us another page exists.
+    if len(docs) <= limit:
+        return docs, None
+
+    last = docs[limit - 1]
+    return docs[:limit], encode_cursor(last.get("created_at"), last["_id"])
@@ -0,0 +1,39 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from responses import FastJSONResponse
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[Set[str]]:
+    if not fields:
+        return None
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested or None
+
+
+# `sources` maps a response field to the document fields it is built from when
+# they differ from its own name. created_at is always kept because the page
+# cursor is built from it.
+def projection_for(model: Type[BaseModel], sources: Optional[Dict[str, Tuple[str, ...]]] = None,
+                   fields: Optional[Iterable[str]] = None) -> dict:
+    sources = sources or {}
+    projection = {"created_at": 1}
+    for name in (fields if fields is not None else model.model_fields):
+        for path in sources.get(name, (name,)):
+            projection[path] = 1
+    return projection
+
+
+# A sparse page skips response_model validation, which would reject the missing
+# required fields, and is encoded directly.
+def sparse_page(items: List[dict], next_cursor: Optional[str], fields: Set[str]) -> FastJSONResponse:
+    return FastJSONResponse({
+        "items": [{name: item.get(name) for name in fields} for item in items],
+        "next_cursor": next_cursor
+    })
@@ -0,0 +1,118 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from instrumentation import current_query_count
+from settings import Settings
+
+
+request_logger = logging.getLogger("request")
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# The queue never leaves the process, so records are not made picklable; only the
+# message and traceback are rendered before the record changes threads.
+class _LocalQueueHandler(QueueHandler):
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+# Request handlers only put records on a queue; formatting and writing to stdout
+# happen on the listener thread.
+def configure_logging(settings: Settings) -> QueueListener:
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    handler = logging.StreamHandler(sys.stdout)
+    if settings.log_format == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [_LocalQueueHandler(records)]
+    root.setLevel(settings.log_level)
+
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+# One summary line per request. Runs inside QueryCountMiddleware so the query
+# count is still readable when the response is done. Errors and writes are always
+# logged; successful reads are kept with probability `read_sample_rate`.
+class RequestLogMiddleware:
+
+    def __init__(self, app, read_sample_rate: float = 1.0):
+        self.app = app
+        self.read_sample_rate = read_sample_rate
+
+    def _keep(self, method: str, status: int) -> bool:
+        if status >= 400 or method not in READ_METHODS:
+            return True
+        return self.read_sample_rate >= 1.0 or random.random() < self.read_sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            method = scope["method"]
+            if self._keep(method, status):
+                request_logger.info("request", extra={"fields": {
+                    "method": method,
+                    "route": getattr(scope.get("route"), "path", "unmatched"),
+                    "status": status,
+                    "duration_ms": round(duration_ms, 2),
+                    "db_queries": current_query_count(),
+                }})
@@ -0,0 +1,47 @@
+import json
+from datetime import date, datetime
+from typing import Any
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from settings import get_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+FAST_JSON_RESPONSES = get_settings().fast_json_responses
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Serializes already-validated models (and plain dicts holding ObjectId/datetime)
+# in one pass. Returning it from a route bypasses response_model re-validation
+# and jsonable_encoder, so only return content the service has already built
+# from its response model. Falls back to the stdlib encoder without orjson.
+class FastJSONResponse(JSONResponse):
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_default)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# Routes opt in by returning fast_response(page); with FAST_JSON_RESPONSES=0 the
+# model goes back through FastAPI's response_model path.
+def fast_response(content: Any) -> Any:
+    if isinstance(content, Response) or not FAST_JSON_RESPONSES:
+        return content
+    return FastJSONResponse(content)
@@ -0,0 +1,87 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    mongo_uri: Optional[str]
+    mongo_db: str
+    mongo_max_pool_size: int
+    mongo_min_pool_size: int
+    mongo_max_idle_time_ms: int
+    mongo_connect_timeout_ms: int
+    mongo_server_selection_timeout_ms: int
+    mongo_socket_timeout_ms: Optional[int]
+    mongo_wait_queue_timeout_ms: Optional[int]
+
+    secret_key: Optional[str]
+    algorithm: str
+    token_expiry_minutes: int
+    token_cache_size: int
+    token_revocation_ttl: float
+
+    password_hash_workers: int
+    password_hash_queue_depth: int
+
+    medicine_cache_size: int
+    medicine_cache_ttl: float
+    medicine_import_chunk_size: int
+
+    fast_json_responses: bool
+    debug_db_queries: bool
+    log_level: str
+    log_format: str
+    log_read_sample_rate: float
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            mongo_uri=os.getenv("URI"),
+            mongo_db=os.getenv("MONGO_DB", "hospital_db"),
+            mongo_max_pool_size=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+            mongo_min_pool_size=int(os.getenv("MONGO_MIN_POOL_SIZE", "10")),
+            mongo_max_idle_time_ms=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+            mongo_connect_timeout_ms=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+            mongo_server_selection_timeout_ms=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            mongo_socket_timeout_ms=_optional_int("MONGO_SOCKET_TIMEOUT_MS"),
+            mongo_wait_queue_timeout_ms=_optional_int("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+
+            secret_key=os.getenv("SECRET_KEY"),
+            algorithm=os.getenv("ALGORITHM", "HS256"),
+            token_expiry_minutes=int(os.getenv("TOKEN_EXPIRY", "30")),
+            token_cache_size=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+            token_revocation_ttl=float(os.getenv("TOKEN_REVOCATION_TTL", "30")),
+
+            password_hash_workers=int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)),
+            password_hash_queue_depth=int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", "32")),
+
+            medicine_cache_size=int(os.getenv("MEDICINE_CACHE_SIZE", "5000")),
+            medicine_cache_ttl=float(os.getenv("MEDICINE_CACHE_TTL", "300")),
+            medicine_import_chunk_size=int(os.getenv("MEDICINE_IMPORT_CHUNK_SIZE", "1000")),
+
+            fast_json_responses=_flag("FAST_JSON_RESPONSES", "1"),
+            debug_db_queries=_flag("DEBUG_DB_QUERIES", "0"),
+            log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+            log_format=os.getenv("LOG_FORMAT", "json").lower(),
+            log_read_sample_rate=float(os.getenv("LOG_READ_SAMPLE_RATE", "1.0")),
+        )
+
+
+# .env is read once, the first time settings are needed.
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    load_dotenv()
+    return Settings.from_env()
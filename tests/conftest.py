@@ -0,0 +1,25 @@
+import pytest
+
+
+# Request this fixture in route tests: it records the Mongo commands each request
+# issues and fails the test if any route went over its @query_budget.
+@pytest.fixture
+def query_budget():
+    from instrumentation import query_observers
+
+    observed = []
+
+    def observe(route, count):
+        observed.append((route, count))
+
+    query_observers.append(observe)
+    yield observed
+    query_observers.remove(observe)
+
+    over = [
+        f"{route.path}: {count} queries, budget {route.endpoint.query_budget}"
+        for route, count in observed
+        if getattr(route.endpoint, "query_budget", None) is not None and count > route.endpoint.query_budget
+    ]
+    if over:
+        pytest.fail("Query budget exceeded: " + "; ".join(over))
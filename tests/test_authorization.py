@@ -0,0 +1,104 @@
+import time
+
+import pytest
+from bson import ObjectId
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from main import create_app
+import middleware
+from middleware import (
+    InvalidToken,
+    authorize,
+    check_not_revoked,
+    compile_route_roles,
+    create_access_token,
+    invalidate_user_tokens,
+    verify_token,
+)
+
+
+def roles_for(app: FastAPI, path: str):
+    route = next(route for route in app.routes if getattr(route, "path", None) == path)
+    return app.state.route_roles.get(id(route))
+
+
+def test_every_protected_route_has_roles():
+    app = create_app()
+    assert roles_for(app, "/doctor/read_all_prescriptions") == {"doctor"}
+    assert roles_for(app, "/nurse/read_all_medicines") == {"nurse"}
+    assert roles_for(app, "/read_all_doctors") == {"management"}
+    assert roles_for(app, "/management/create_doctor") == {"management"}
+    assert roles_for(app, "/register") == {"management"}
+    assert roles_for(app, "/login") is None
+
+
+def test_uncovered_routes_fail_startup():
+    app = FastAPI()
+    router = APIRouter()
+
+    @router.get("/unguarded")
+    def unguarded():
+        return {}
+
+    @router.get("/untagged", dependencies=[Depends(authorize)])
+    def untagged():
+        return {}
+
+    app.include_router(router)
+    with pytest.raises(RuntimeError) as exc:
+        compile_route_roles(app.routes)
+    assert "/unguarded" in str(exc.value)
+    assert "/untagged" in str(exc.value)
+
+
+def test_missing_token_is_rejected_before_the_handler():
+    client = TestClient(create_app())
+    response = client.get("/nurse/read_all_medicines")
+    assert response.status_code == 401
+
+
+class UserTokens:
+
+    def __init__(self, valid_after: float):
+        self.valid_after = valid_after
+        self.reads = 0
+
+    async def tokens_valid_after(self, id):
+        self.reads += 1
+        return self.valid_after
+
+
+@pytest.mark.asyncio
+async def test_password_change_revokes_earlier_tokens(monkeypatch):
+    monkeypatch.setattr(middleware, "SECRET_KEY", "authorization-tests")
+    user_id = str(ObjectId())
+    token = create_access_token({"user_id": user_id, "role": "doctor"})
+    claims = verify_token(token)
+
+    users = UserTokens(0.0)
+    assert (await check_not_revoked(claims, users))["user_id"] == user_id
+    await check_not_revoked(claims, users)
+    assert users.reads == 1
+
+    # Changed through another worker within the same second: seen once the entry expires.
+    users.valid_after = claims["iat"] + 0.001
+    middleware.tokens_valid_after.pop(user_id)
+    with pytest.raises(InvalidToken):
+        await check_not_revoked(claims, users)
+
+    later = create_access_token({"user_id": user_id, "role": "doctor"})
+    assert (await check_not_revoked(verify_token(later), users))["user_id"] == user_id
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_tokens_applies_without_a_read(monkeypatch):
+    monkeypatch.setattr(middleware, "SECRET_KEY", "authorization-tests")
+    user_id = str(ObjectId())
+    claims = verify_token(create_access_token({"user_id": user_id, "role": "nurse"}))
+
+    invalidate_user_tokens(user_id, time.time())
+    users = UserTokens(0.0)
+    with pytest.raises(InvalidToken):
+        await check_not_revoked(claims, users)
+    assert users.reads == 0
@@ -0,0 +1,52 @@
+from cache import LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=30, clock=clock)
+    cache.set("ttl", "x")
+    cache.set("absolute", "y", expires_at=clock.now + 5)
+
+    clock.now += 10
+    assert cache.get("absolute") is None
+    assert cache.get("ttl") == "x"
+
+    clock.now += 30
+    assert cache.get("ttl") is None
+
+
+def test_stats_and_pop_where():
+    cache = LRUCache(maxsize=10)
+    cache.set("t1", {"user_id": "u1"})
+    cache.set("t2", {"user_id": "u2"})
+    cache.get("t1")
+    cache.get("missing")
+
+    assert cache.pop_where(lambda claims: claims["user_id"] == "u1") == 1
+    assert cache.get("t1") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["size"] == 1
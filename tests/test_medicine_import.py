@@ -0,0 +1,28 @@
+import pytest
+
+from Services import medicine_services
+from Services.medicine_services import iter_lines, parse_medicine_rows
+
+
+async def chunks(data: bytes, size: int = 7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def rows(data: bytes, fmt: str) -> list:
+    return [(line, error) async for line, medicine, error in parse_medicine_rows(iter_lines(chunks(data)), fmt)]
+
+
+@pytest.mark.asyncio
+async def test_long_lines_are_invalid_rows_and_streaming_continues(monkeypatch):
+    monkeypatch.setattr(medicine_services, "IMPORT_MAX_LINE_BYTES", 80)
+    ok = b'Paracetamol,2030-01-01T00:00:00,5'
+    data = b"medicine_name,expiry,quantity\n" + ok + b"\n" + b"x" * 200 + b"\n" \
+        + b'"' + b"y" * 100 + b"\nstill quoted" + b'",2030-01-01T00:00:00,5\n' + ok + b"\n"
+
+    assert await rows(data, "csv") == [
+        (2, None), (3, "Malformed row: record too long"), (4, "Malformed row: record too long"), (6, None),
+    ]
+
+    data = b'{"medicine_name": "A", "expiry": "2030-01-01T00:00:00", "quantity": 1}\n' + b"{" * 200 + b"\n"
+    assert [error for _, error in await rows(data, "ndjson")] == [None, "Malformed row: line too long"]
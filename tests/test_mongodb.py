@@ -1,8 +1,13 @@
 import pytest
-from DB.mongodb import client
+from DB.mongodb import create_client
+from settings import get_settings
 
 @pytest.mark.asyncio
 
 async def test_connection():
-    result = await client.admin.command("ping")
-    assert result['ok'] == 1
\ No newline at end of file
+    client = create_client(get_settings())
+    try:
+        result = await client.admin.command("ping")
+        assert result['ok'] == 1
+    finally:
+        await client.close()
@@ -0,0 +1,16 @@
+from fastapi.routing import APIRoute
+
+from Routes.medicine_routes import medicine_router
+from Routes.prescription_routes import prescription_crud_route
+from Routes.staff_routes import staff_router
+from Routes.user_routes import user_auth_route
+
+
+def test_every_route_declares_a_query_budget():
+    missing = [
+        route.path
+        for router in (medicine_router, prescription_crud_route, staff_router, user_auth_route)
+        for route in router.routes
+        if isinstance(route, APIRoute) and not hasattr(route.endpoint, "query_budget")
+    ]
+    assert missing == []
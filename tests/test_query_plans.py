@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+from argparse import Namespace
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import AsyncMongoClient, MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+from benchmarks.seed import seed
+from pagination import encode_cursor, seek_filter
+from Repositories.medicine_repository import MedicineRepository
+from Repositories.prescription_repository import PrescriptionRepository
+from Repositories.user_repository import UserRepository
+
+
+PLAN_URI = os.getenv("QUERY_PLAN_MONGO_URI", "mongodb://localhost:27017")
+PLAN_DB = "hospital_query_plans"
+PLAN_REPORT = os.getenv("QUERY_PLAN_REPORT")
+MAX_EXAMINED_RATIO = 2.0
+
+INDEXED_STAGES = {"IXSCAN", "IDHACK", "EXPRESS_IXSCAN", "EXPRESS_CLUSTERED_IXSCAN"}
+SESSION_FIELDS = {"lsid", "txnNumber", "startTransaction", "autocommit", "apiVersion", "apiStrict", "apiDeprecationErrors", "cursor"}
+
+plan_report = {}
+
+
+class CommandCapture(monitoring.CommandListener):
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in ("find", "aggregate", "findAndModify", "update", "delete"):
+            self.commands.append(dict(event.command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+@pytest.fixture(scope="module")
+def manifest(tmp_path_factory):
+    try:
+        MongoClient(PLAN_URI, serverSelectionTimeoutMS=2000).admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"no mongod at {PLAN_URI}")
+
+    path = tmp_path_factory.mktemp("plans") / "manifest.json"
+    asyncio.run(seed(Namespace(
+        uri=PLAN_URI, db=PLAN_DB, doctors=30, nurses=5, medicines=200, prescriptions=20_000,
+        skew=1.1, days=90, stock=1_000_000, batch_size=5_000, concurrency=2, seed=1,
+        manifest=str(path), drop=True
+    )))
+    with open(path) as f:
+        yield json.load(f)
+
+    if PLAN_REPORT:
+        with open(PLAN_REPORT, "w") as f:
+            json.dump(plan_report, f, indent=2, sort_keys=True)
+
+
+# Each statement of a multi-statement write is explained on its own.
+def explainable(command: dict) -> list:
+    name = next(iter(command))
+    base = {key: value for key, value in command.items() if not key.startswith("$") and key not in SESSION_FIELDS}
+    if name == "aggregate":
+        base["cursor"] = {}
+    if name in ("update", "delete"):
+        key = "updates" if name == "update" else "deletes"
+        return [{**base, key: [statement]} for statement in command[key]]
+    return [base]
+
+
+def stage_names(node) -> list:
+    names = []
+    if isinstance(node, dict):
+        if isinstance(node.get("stage"), str):
+            names.append(node["stage"])
+        for key, value in node.items():
+            if key != "rejectedPlans":
+                names.extend(stage_names(value))
+    elif isinstance(node, list):
+        for value in node:
+            names.extend(stage_names(value))
+    return names
+
+
+def plan_parts(explain: dict):
+    if "stages" in explain:
+        cursor = explain["stages"][0]["$cursor"]
+        pipeline = [next(iter(stage)) for stage in explain["stages"][1:]]
+        return cursor["queryPlanner"]["winningPlan"], cursor["executionStats"], pipeline
+    return explain["queryPlanner"]["winningPlan"], explain["executionStats"], []
+
+
+async def explain_repository_call(name: str, call):
+    capture = CommandCapture()
+    client = AsyncMongoClient(PLAN_URI, event_listeners=[capture])
+    try:
+        db = client[PLAN_DB]
+        await call(db)
+        assert capture.commands, f"{name} issued no query"
+
+        for command in capture.commands:
+            for index, statement in enumerate(explainable(command)):
+                explain = await db.command({"explain": statement, "verbosity": "executionStats"})
+                winning_plan, stats, pipeline = plan_parts(explain)
+                stages = stage_names(winning_plan)
+                examined = stats.get("totalDocsExamined", 0)
+                returned = stats.get("nReturned", 0)
+                label = f"{name}[{next(iter(statement))}#{index}]"
+
+                plan_report[label] = {
+                    "stages": stages,
+                    "pipeline": pipeline,
+                    "docsExamined": examined,
+                    "nReturned": returned,
+                    "ratio": examined / max(returned, 1),
+                }
+
+                assert "COLLSCAN" not in stages, f"{label} scans the collection: {stages}"
+                assert INDEXED_STAGES & set(stages), f"{label} uses no index: {stages}"
+                assert "SORT" not in stages and "$sort" not in pipeline, f"{label} sorts in memory: {stages} {pipeline}"
+                assert examined <= max(returned, 1) * MAX_EXAMINED_RATIO, \
+                    f"{label} examined {examined} documents to return {returned}"
+    finally:
+        await client.close()
+
+
+def busiest_doctor(manifest) -> ObjectId:
+    return ObjectId(max(manifest["doctors"], key=lambda doctor: len(doctor["prescriptions"]))["id"])
+
+
+async def second_page_seek(collection, query: dict) -> dict:
+    page = await collection.find(query, {"created_at": 1}).sort([("created_at", -1), ("_id", -1)]).limit(50).to_list()
+    return seek_filter(encode_cursor(page[-1].get("created_at"), page[-1]["_id"]))
+
+
+@pytest.mark.asyncio
+async def test_user_queries_use_indexes(manifest):
+    async def call(db):
+        users = UserRepository(db["user"])
+        await users.get_by_email(manifest["doctors"][0]["email"])
+        await users.existing_emails([doctor["email"] for doctor in manifest["doctors"][:10]] + ["missing@bench.local"])
+        await users.list_by_role("doctor", {}, 11, {"username": 1, "email": 1, "created_at": 1})
+        await users.list_by_role("doctor", await second_page_seek(db["user"], {"role": "doctor"}), 11)
+
+    await explain_repository_call("user", call)
+
+
+@pytest.mark.asyncio
+async def test_prescription_queries_use_indexes(manifest):
+    doctor_id = busiest_doctor(manifest)
+    prescription_id = ObjectId(next(doctor for doctor in manifest["doctors"] if doctor["prescriptions"])["prescriptions"][0])
+
+    async def call(db):
+        prescriptions = PrescriptionRepository(db["prescriptions"])
+        await prescriptions.list_for_doctor(doctor_id, {}, 51)
+        await prescriptions.list_for_doctor(doctor_id, await second_page_seek(db["prescriptions"], {"doctor_id": doctor_id}), 51)
+        await prescriptions.get_for_doctor(prescription_id, doctor_id)
+        await prescriptions.update_for_doctor(prescription_id, doctor_id, {"description": "plan test"})
+        await prescriptions.delete_for_doctor(ObjectId(), doctor_id)
+
+    await explain_repository_call("prescriptions", call)
+
+
+@pytest.mark.asyncio
+async def test_prescription_aggregation_uses_indexes(manifest):
+    doctor_id = busiest_doctor(manifest)
+
+    async def call(db):
+        cursor = await PrescriptionRepository(db["prescriptions"]).aggregate_for_doctor(doctor_id, {}, 50, "medicine")
+        await cursor.to_list()
+
+    await explain_repository_call("prescriptions_aggregate", call)
+
+
+@pytest.mark.asyncio
+async def test_medicine_queries_use_indexes(manifest):
+    nurse = manifest["nurses"][0]
+    nurse_id = ObjectId(nurse["id"])
+    medicine_id = ObjectId(nurse["medicines"][0])
+
+    async def call(db):
+        transactions = bool((await db.client.admin.command("hello")).get("setName"))
+        medicines = MedicineRepository(db["medicine"], transactions=transactions)
+        await medicines.list_for_nurse(nurse_id, {}, 51)
+        await medicines.list_for_nurse(nurse_id, await second_page_seek(db["medicine"], {"nurse_id": nurse_id}), 51)
+        await medicines.get_for_nurse(medicine_id, nurse_id)
+        await medicines.get_many([ObjectId(id) for id in manifest["medicines"][:20]], {"quantity": 1})
+        await medicines.update_for_nurse(medicine_id, nurse_id, {"expiry": datetime.utcnow() + timedelta(days=400)})
+        await medicines.apply_stock_changes([(medicine_id, -1)])
+        await medicines.revert_stock_changes([(medicine_id, -1)])
+        await medicines.add_stock(nurse_id, {("Medicine 0", datetime(2030, 1, 1)): 5}, datetime.utcnow())
+
+    await explain_repository_call("medicine", call)
@@ -0,0 +1,28 @@
+import json
+import logging
+import sys
+
+from request_logging import JSONFormatter, RequestLogMiddleware
+
+
+def test_json_formatter_merges_fields_and_traceback():
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        record = logging.LogRecord("request", logging.ERROR, __file__, 1, "failed %s", ("x",), sys.exc_info())
+    record.fields = {"route": "/doctor/read_prescriptions", "status": 500}
+    record.exc_text = logging.Formatter().formatException(record.exc_info)
+
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry["message"] == "failed x"
+    assert entry["route"] == "/doctor/read_prescriptions"
+    assert entry["status"] == 500
+    assert "ValueError: bad" in entry["exc_info"]
+
+
+def test_only_successful_reads_are_sampled():
+    middleware = RequestLogMiddleware(app=None, read_sample_rate=0.0)
+    assert not middleware._keep("GET", 200)
+    assert middleware._keep("GET", 404)
+    assert middleware._keep("POST", 200)
+    assert RequestLogMiddleware(app=None, read_sample_rate=1.0)._keep("GET", 200)
@@ -0,0 +1,84 @@
+import dataclasses
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+import main
+import middleware
+from cache import LRUCache
+from settings import get_settings
+
+
+BUDGET_URI = os.getenv("QUERY_PLAN_MONGO_URI", "mongodb://localhost:27017")
+BUDGET_DB = "hospital_route_budgets"
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    try:
+        client = MongoClient(BUDGET_URI, serverSelectionTimeoutMS=2000)
+        hello = client.admin.command("hello")
+    except PyMongoError:
+        pytest.skip(f"no mongod at {BUDGET_URI}")
+
+    client.drop_database(BUDGET_DB)
+    db = client[BUDGET_DB]
+    doctor_id, nurse_id, medicine_id = ObjectId(), ObjectId(), ObjectId()
+    db["medicine"].insert_one({
+        "_id": medicine_id, "nurse_id": nurse_id, "medicine_name": "Paracetamol", "quantity": 1000,
+        "expiry": datetime.utcnow() + timedelta(days=365), "created_at": datetime.utcnow(),
+    })
+    yield {"doctor_id": doctor_id, "medicine_id": medicine_id, "replica_set": bool(hello.get("setName"))}
+    client.drop_database(BUDGET_DB)
+    client.close()
+
+
+@pytest.fixture
+def doctor(seeded, monkeypatch):
+    settings = dataclasses.replace(get_settings(), mongo_uri=BUDGET_URI, mongo_db=BUDGET_DB, mongo_min_pool_size=1)
+    monkeypatch.setattr(main, "get_settings", lambda: settings)
+    monkeypatch.setattr(middleware, "SECRET_KEY", "route-budget-tests")
+
+    # authorize reads the user's tokens_valid_after once per TOKEN_REVOCATION_TTL;
+    # prime it so the counts below are the routes' own.
+    monkeypatch.setattr(middleware, "tokens_valid_after", LRUCache(maxsize=1))
+    middleware.tokens_valid_after.set(str(seeded["doctor_id"]), 0.0)
+
+    token = middleware.create_access_token({"user_id": str(seeded["doctor_id"]), "role": "doctor"})
+    with TestClient(main.create_app()) as client:
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+
+
+def counts(observed, path: str) -> list:
+    return [count for route, count in observed if route.path == path]
+
+
+def test_prescription_routes_stay_within_budget(doctor, seeded, query_budget):
+    medicines = [{"medicine_id": str(seeded["medicine_id"]), "quantity": 2}]
+
+    response = doctor.post("/doctor/create_prescription", json={
+        "patient_id": str(ObjectId()), "patient_name": "Patient", "description": "Fever",
+        "expiry": (datetime.utcnow() + timedelta(days=7)).isoformat(), "medicines": medicines,
+    })
+    assert response.status_code == 201, response.text
+
+    response = doctor.get("/doctor/read_all_prescriptions", params={"limit": 150})
+    assert response.status_code == 200, response.text
+    prescription_id = response.json()["items"][0]["prescription_id"]
+
+    response = doctor.put(f"/doctor/update_prescription_by_id/{prescription_id}", json={
+        "medicines": [{"medicine_id": str(seeded["medicine_id"]), "quantity": 5}],
+    })
+    assert response.status_code == 200, response.text
+
+    # On a replica set stock reservation is an update plus commitTransaction.
+    commit = 1 if seeded["replica_set"] else 0
+    assert counts(query_budget, "/doctor/create_prescription") == [2 + commit]
+    assert counts(query_budget, "/doctor/read_all_prescriptions") == [1]
+    assert counts(query_budget, "/doctor/update_prescription_by_id/{id}") == [3 + commit]
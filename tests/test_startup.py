@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+STARTUP_BUDGET_S = float(os.getenv("STARTUP_BUDGET_S", "1.0"))
+
+# Only needed when a password is hashed or a token is signed, so they must not
+# be imported just to start the app. psycopg2 is not a dependency at all.
+LAZY_MODULES = ("passlib", "bcrypt", "jose", "psycopg2")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def import_main() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, "URI": os.getenv("URI", "mongodb://localhost:27017")},
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_import_main_within_budget():
+    probe = import_main()
+    assert probe["elapsed"] < STARTUP_BUDGET_S, (
+        f"import main took {probe['elapsed']:.2f}s (budget {STARTUP_BUDGET_S}s); "
+        "see python -m benchmarks.importtime"
+    )
+
+
+def test_heavy_modules_stay_lazy():
+    modules = import_main()["modules"]
+    loaded = [name for name in modules if name.split(".")[0] in LAZY_MODULES]
+    assert loaded == []
@@ -0,0 +1,156 @@
+import asyncio
+import os
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.errors import PyMongoError
+
+from Repositories.medicine_repository import MedicineRepository
+from Services.prescription_services import adjust_medicine_stock, release_stock, reserve_stock
+
+
+STOCK_URI = os.getenv("QUERY_PLAN_MONGO_URI", "mongodb://localhost:27017")
+STOCK_DB = "hospital_stock_tests"
+
+
+@pytest.fixture(scope="module")
+def replica_set() -> bool:
+    try:
+        hello = MongoClient(STOCK_URI, serverSelectionTimeoutMS=2000).admin.command("hello")
+    except PyMongoError:
+        pytest.skip(f"no mongod at {STOCK_URI}")
+    return bool(hello.get("setName"))
+
+
+# Every test runs against the transaction path and the standalone fallback.
+@pytest.fixture(params=[True, False], ids=["transaction", "standalone"])
+def transactions(request, replica_set) -> bool:
+    if request.param and not replica_set:
+        pytest.skip(f"{STOCK_URI} is not a replica set member")
+    return request.param
+
+
+async def stocked(client: AsyncMongoClient, transactions: bool, *quantities: int):
+    collection = client[STOCK_DB]["medicine"]
+    await collection.drop()
+    ids = [ObjectId() for _ in quantities]
+    await collection.insert_many([
+        {"_id": id, "medicine_name": f"Medicine {i}", "quantity": quantity}
+        for i, (id, quantity) in enumerate(zip(ids, quantities))
+    ])
+    return MedicineRepository(collection, transactions=transactions), ids
+
+
+async def quantities(repo: MedicineRepository, ids) -> list:
+    docs = {doc["_id"]: doc["quantity"] for doc in await repo.get_many(ids, {"quantity": 1})}
+    return [docs.get(id) for id in ids]
+
+
+@pytest.mark.asyncio
+async def test_insufficient_stock_mid_batch_changes_nothing(transactions):
+    client = AsyncMongoClient(STOCK_URI)
+    try:
+        repo, (a, b, c) = await stocked(client, transactions, 10, 1, 10)
+
+        with pytest.raises(HTTPException) as exc:
+            await reserve_stock(repo, {a: 5, b: 5, c: 5})
+        assert exc.value.status_code == 409
+        assert await quantities(repo, [a, b, c]) == [10, 1, 10]
+
+        result = await repo.apply_stock_changes([(a, -5), (b, -5), (c, -5)])
+        assert result.insufficient == 1
+        assert result.applied == []
+        assert result.rolled_back == [0, 2]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_missing_medicine_is_404_and_leaves_no_document(transactions):
+    client = AsyncMongoClient(STOCK_URI)
+    try:
+        repo, (a,) = await stocked(client, transactions, 10)
+        missing = ObjectId()
+
+        with pytest.raises(HTTPException) as exc:
+            await reserve_stock(repo, {a: 1, missing: 1})
+        assert exc.value.status_code == 404
+        assert await quantities(repo, [a]) == [10]
+        assert await repo.collection.count_documents({}) == 1
+        assert await repo.get(missing) is None
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reservations_cannot_oversell(transactions):
+    client = AsyncMongoClient(STOCK_URI)
+    try:
+        repo, (a,) = await stocked(client, transactions, 3)
+
+        outcomes = await asyncio.gather(
+            reserve_stock(repo, {a: 2}), reserve_stock(repo, {a: 2}), return_exceptions=True
+        )
+        assert sum(outcome is None for outcome in outcomes) == 1
+        assert [outcome.status_code for outcome in outcomes if outcome is not None] == [409]
+        assert await quantities(repo, [a]) == [1]
+
+        repo, (b,) = await stocked(client, transactions, 10)
+        outcomes = await asyncio.gather(*(reserve_stock(repo, {b: 1}) for _ in range(25)), return_exceptions=True)
+        assert sum(outcome is None for outcome in outcomes) == 10
+        assert await quantities(repo, [b]) == [0]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_release_and_adjust_move_stock_both_ways(transactions):
+    client = AsyncMongoClient(STOCK_URI)
+    try:
+        repo, (a, b) = await stocked(client, transactions, 10, 10)
+
+        await reserve_stock(repo, {a: 4})
+        await release_stock(repo, {a: 4})
+        assert await quantities(repo, [a]) == [10]
+
+        old = [{"medicine_id": str(a), "quantity": 4}]
+        new = [{"medicine_id": str(a), "quantity": 1}, {"medicine_id": str(b), "quantity": 3}]
+        outcomes = await adjust_medicine_stock(repo, old, new)
+        assert {o["medicine_id"]: o["stock_delta"] for o in outcomes} == {str(a): 3, str(b): -3}
+        assert await quantities(repo, [a, b]) == [13, 7]
+
+        with pytest.raises(HTTPException) as exc:
+            await adjust_medicine_stock(repo, [], [{"medicine_id": str(a), "quantity": 1}, {"medicine_id": str(b), "quantity": 50}])
+        assert exc.value.status_code == 409
+        assert await quantities(repo, [a, b]) == [13, 7]
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_adjust_sums_duplicate_lines_and_rejects_bad_quantities(transactions):
+    client = AsyncMongoClient(STOCK_URI)
+    try:
+        repo, (a,) = await stocked(client, transactions, 10)
+
+        old = [{"medicine_id": str(a), "quantity": 2}, {"medicine_id": str(a), "quantity": 2}]
+        assert await adjust_medicine_stock(repo, old, [{"medicine_id": str(a), "quantity": 4}]) == []
+
+        outcomes = await adjust_medicine_stock(repo, old, [{"medicine_id": str(a), "quantity": 1}])
+        assert [o["stock_delta"] for o in outcomes] == [3]
+        assert await quantities(repo, [a]) == [13]
+
+        with pytest.raises(HTTPException) as exc:
+            await adjust_medicine_stock(repo, old, [{"medicine_id": str(a), "quantity": 0}])
+        assert exc.value.status_code == 400
+        assert await quantities(repo, [a]) == [13]
+
+        # Stored lines from before quantities were validated do not block an edit.
+        legacy = [{"medicine_id": str(a), "quantity": 0}, {"medicine_id": str(a), "quantity": -2}]
+        outcomes = await adjust_medicine_stock(repo, legacy, [{"medicine_id": str(a), "quantity": 3}])
+        assert [o["stock_delta"] for o in outcomes] == [-3]
+        assert await quantities(repo, [a]) == [10]
+    finally:
+        await client.close()